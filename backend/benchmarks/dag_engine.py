@@ -0,0 +1,301 @@
+"""
+Бенчмарк движка DAG на синтетических графах без БД и реальных коннекторов.
+
+Граф собирается через rootDag.create_from_json: pin:input -> ... -> pin:output.
+События подаются в Port.income_value с заданной частотой из отдельного потока (как из MQTT),
+задержка измеряется от income_value до отправки значения в коннектор из OutputPinClass.execute.
+
+Запуск из каталога backend:
+  python -m benchmarks.dag_engine --graph all --nodes 20 --rate 200 --duration 5
+  python -m benchmarks.dag_engine --graph diamond --propagation wave
+"""
+from time import perf_counter, sleep
+import argparse
+import asyncio
+import contextlib
+import copy
+import json
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil
+
+from utils.configs import config
+
+PORT_IN = 1
+PORT_OUT = 2
+
+
+class BenchConnector:
+  """Подмена коннектора: запоминает время отправки значения в устройство"""
+
+  def __init__(self):
+    self.sent = {}  # seq -> perf_counter() при income_value
+    self.received = {}  # seq -> perf_counter() при первой доставке
+    self.deliveries = 0
+
+  def add_device(self, device):
+    pass
+
+  def send_value(self, device, port, value):
+    ts = perf_counter()
+    self.deliveries += 1
+    seq = int(value)
+    if seq in self.sent and seq not in self.received:
+      self.received[seq] = ts
+
+  def reset(self):
+    self.sent = {}
+    self.received = {}
+    self.deliveries = 0
+
+
+def init_offline_devices(connector: BenchConnector):
+  """Devices без БД: одно устройство с входным и выходным портами"""
+  from models.devices import Devices, Device
+  devices = Devices.__new__(Devices)
+  devices.is_initialized = True
+  devices.devices_class = {}
+  devices.devices = {}
+  devices.devices_names = {}
+  devices.ports = {}
+
+  device = Device(None, connector, {'params': {}, 'id': 1, 'code': 'bench', 'name': 'bench', 'type': 'bench',
+                                    'model': None, 'vendor': None, 'description': None,
+                                    'connection_id': 0, 'location_id': None})
+  devices.devices[device.id] = device
+  devices.devices_names[device.name] = device.id
+  for port_id, code in [(PORT_IN, 'in'), (PORT_OUT, 'out')]:
+    port = {'id': port_id, 'code': code, 'label': code, 'access': None, 'type': 'numeric', 'values_variant': None,
+            'description': None, 'name': code, 'mode': None, 'unit': None, 'device_id': device.id}
+    devices.ports[port_id] = device.add_port(port)
+  return devices
+
+
+def init_offline_templates(templates: dict):
+  """Шаблоны берутся из словаря вместо БД"""
+  from orchestrator.template_manager import TemplateManager
+  from models.dag_template import DAGTemplateBase
+
+  def get_template(self, name: str, version: str, params: dict = None, path=None):
+    tpl = templates.get((name, version))
+    if tpl is None:
+      return
+    dag = DAGTemplateBase(tpl=copy.deepcopy(tpl), path=path, params=params)
+    dag.root_name = f'v{dag.id}'
+    return dag
+
+  TemplateManager.get_template = get_template
+
+
+def node(dag_id: str, code: str, outputs: dict = None, params: dict = None) -> dict:
+  return {'id': dag_id, 'code': code, 'params': params or {}, 'position': [0, 0], 'outputs': outputs or {}}
+
+
+def pass_filter(dag_id: str, outputs: list) -> dict:
+  return node(dag_id, 'filter', {'default': outputs}, {'state': 2})
+
+
+def pins(first: str, last: str) -> list:
+  return [
+    node('pin_in', 'pin:input', {'default': [('in', first, 'value')]}, {'pin_id': PORT_IN}),
+    node('pin_out', 'pin:output', {}, {'pin_id': PORT_OUT}),
+  ]
+
+
+def graph_chain(count: int) -> (list, dict):
+  dags = [pass_filter(f'f{i}', [('in', f'f{i + 1}' if i + 1 < count else 'pin_out', 'value' if i + 1 < count
+                                 else 'default')]) for i in range(count)]
+  return [*pins('f0', 'pin_out'), *dags], {}
+
+
+def graph_fanout(count: int) -> (list, dict):
+  dags = [pass_filter('split', [('in', f'f{i}', 'value') for i in range(count)])]
+  dags += [pass_filter(f'f{i}', [('in', 'pin_out', 'default')]) for i in range(count)]
+  return [*pins('split', 'pin_out'), *dags], {}
+
+
+def graph_diamond(count: int) -> (list, dict):
+  dags = [pass_filter('split', [('in', f'f{i}', 'value') for i in range(count)])]
+  dags += [pass_filter(f'f{i}', [('in', 'join', 'value')]) for i in range(count)]
+  dags += [pass_filter('join', [('in', 'pin_out', 'default')])]
+  return [*pins('split', 'pin_out'), *dags], {}
+
+
+def graph_template(count: int) -> (list, dict):
+  """pin -> outer(inner(цепочка count фильтров)) -> pin"""
+
+  def template(name: str, dags: list, first: str) -> dict:
+    return {'name': name, 'version': '0.0.1', 'description': name, 'sub_title': name,
+            'template': {'input': [{'id': 'input_in', 'name': 'in', 'position': [0, 0],
+                                    'outputs': {'default': [('in', first, 'value' if first.startswith('f')
+                                                             else 'in')]}}],
+                         'param': [],
+                         'output': [{'id': 'output_out', 'name': 'out', 'position': [0, 0]}],
+                         'dags': dags}}
+
+  inner = [pass_filter(f'f{i}', [('in', f'f{i + 1}' if i + 1 < count else 'output_out', 'value'
+                                  if i + 1 < count else 'default')]) for i in range(count)]
+  outer = [node('t_inner', 'tpl:bench_inner|0.0.1', {'out': [('in', 'output_out', 'default')]})]
+  templates = {('bench_inner', '0.0.1'): template('bench_inner', inner, 'f0'),
+               ('bench_outer', '0.0.1'): template('bench_outer', outer, 't_inner')}
+  dags = [node('pin_in', 'pin:input', {'default': [('in', 't_outer', 'in')]}, {'pin_id': PORT_IN}),
+          node('pin_out', 'pin:output', {}, {'pin_id': PORT_OUT}),
+          node('t_outer', 'tpl:bench_outer|0.0.1', {'out': [('in', 'pin_out', 'default')]})]
+  return dags, templates
+
+
+GRAPHS = {
+  'chain': graph_chain,
+  'fanout': graph_fanout,
+  'diamond': graph_diamond,
+  'template': graph_template,
+}
+
+
+def percentile(values: list, p: float) -> float:
+  if not values:
+    return 0.0
+  values = sorted(values)
+  return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def wait_idle(timeout: float):
+  from orchestrator.executor import dag_executor
+  end = perf_counter() + timeout
+  while perf_counter() < end:
+    stats = dag_executor.stats()
+    if not stats['queued'] and not stats['active_nodes']:
+      return True
+    await asyncio.sleep(0.05)
+  return False
+
+
+async def run_graph(name: str, count: int, rate: float, duration: float, connector: BenchConnector) -> dict:
+  from models.root_dag import rootDag
+  from models.devices import Devices
+
+  process = psutil.Process()
+  rss_before = process.memory_info().rss
+  dag_json, templates = GRAPHS[name](count)
+  init_offline_templates(templates)
+  root = rootDag()
+  await root.create_from_json(dag_json)
+  await asyncio.sleep(0.5)  # set_param пинов и сборка шаблонов выполняются задачами
+  rss_graph = process.memory_info().rss
+
+  connector.reset()
+  port = Devices().ports[PORT_IN]
+  threads_peak = threading.active_count()
+  stop = threading.Event()
+
+  def drive():
+    interval = 1 / rate
+    start = perf_counter()
+    seq = 0
+    while not stop.is_set() and perf_counter() - start < duration:
+      seq += 1
+      connector.sent[seq] = perf_counter()
+      port.income_value(seq)
+      delay = start + seq * interval - perf_counter()
+      if delay > 0:
+        sleep(delay)
+
+  started = perf_counter()
+  driver = threading.Thread(target=drive, daemon=True)
+  driver.start()
+  while driver.is_alive():
+    threads_peak = max(threads_peak, threading.active_count())
+    await asyncio.sleep(0.05)
+  # income_value выполняется в потоке подачи - фактическая частота может быть ниже заданной
+  sent_rate = len(connector.sent) / (perf_counter() - started)
+  idle = await wait_idle(max(10.0, duration))
+  elapsed = perf_counter() - started
+  stop.set()
+
+  latencies = [(connector.received[seq] - sent) * 1000 for seq, sent in connector.sent.items()
+               if seq in connector.received]
+  result = {
+    'graph': name,
+    'nodes': len(root.dags),
+    'events': len(connector.sent),
+    'sent_rate': round(sent_rate, 1),
+    'delivered': len(connector.received),  # Уникальные события, дошедшие до выходного порта
+    'deliveries': connector.deliveries,
+    'throughput': round(len(connector.received) / elapsed, 1),
+    'p50_ms': round(percentile(latencies, 50), 3),
+    'p99_ms': round(percentile(latencies, 99), 3),
+    'max_ms': round(max(latencies, default=0), 3),
+    'threads_peak': threads_peak,
+    'graph_rss_mb': round((rss_graph - rss_before) / 2 ** 20, 2),
+    'rss_mb': round(process.memory_info().rss / 2 ** 20, 2),
+    'drained': idle,
+  }
+  root.kill()
+  Devices().ports[PORT_IN].subscriber = ()
+  return result
+
+
+def isolate_store(path: str):
+  """Бенчмарк не пишет в ../store: история, снимки, состояние узлов и логи - во временный каталог"""
+  from utils import logs
+  config['timeseries']['enabled'] = False
+  config['timeseries']['path'] = os.path.join(path, 'timeseries.db')
+  config['ports']['history_size'] = 0
+  config['ports']['snapshot_path'] = os.path.join(path, 'ports_snapshot.bin')
+  config['ports']['snapshot_interval'] = 0
+  config['dags']['checkpoint_path'] = os.path.join(path, 'dag_state.jsonl')
+  config['dags']['checkpoint_interval'] = 0
+  logs.LOG_DIR = os.path.join(path, 'logs')
+
+
+async def main(args):
+  from orchestrator.executor import dag_executor
+  from orchestrator.propagation import propagation_stats
+
+  config['dags']['propagation'] = args.propagation
+  connector = BenchConnector()
+  init_offline_devices(connector)
+
+  results = []
+  for name in (GRAPHS if args.graph == 'all' else [args.graph]):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+      results.append(await run_graph(name, args.nodes, args.rate, args.duration, connector))
+  return results, {**dag_executor.stats(), 'propagation': propagation_stats.get_json()}
+
+
+def print_report(results: list, engine: dict):
+  columns = ['graph', 'nodes', 'events', 'sent_rate', 'delivered', 'deliveries', 'throughput', 'p50_ms', 'p99_ms', 'max_ms',
+             'threads_peak', 'graph_rss_mb', 'rss_mb', 'drained']
+  widths = {column: max(len(column), *(len(str(item[column])) for item in results)) for column in columns}
+  print(' '.join(column.rjust(widths[column]) for column in columns))
+  for item in results:
+    print(' '.join(str(item[column]).rjust(widths[column]) for column in columns))
+  print()
+  print('engine:', json.dumps(engine))
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='DAG engine benchmark')
+  parser.add_argument('--graph', choices=['all', *GRAPHS], default='all')
+  parser.add_argument('--nodes', type=int, default=10, help='Размер графа (длина цепочки / ширина веера)')
+  parser.add_argument('--rate', type=float, default=100, help='Событий в секунду')
+  parser.add_argument('--duration', type=float, default=3, help='Длительность подачи событий, секунды')
+  parser.add_argument('--propagation', choices=['depth', 'wave'], default=config['dags'].get('propagation'))
+  parser.add_argument('--json', action='store_true', help='Вывод в JSON')
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as store:
+    isolate_store(store)
+    results, engine = asyncio.run(main(args))
+    from utils.logs import log_writer
+    log_writer.flush()
+    log_writer.close()
+  if args.json:
+    print(json.dumps({'results': results, 'engine': engine}))
+  else:
+    print_report(results, engine)
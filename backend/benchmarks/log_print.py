@@ -0,0 +1,95 @@
+"""
+log_print: прежняя реализация (inspect.stack, makedirs/open/close на каждую строку)
+против текущей (sys._getframe, фоновая запись пачками в открытый часовой файл).
+Строки пишутся во временный каталог, консольный вывод отключается.
+
+Запуск из каталога backend:
+  python -m benchmarks.log_print --lines 20000
+"""
+from datetime import datetime
+from time import perf_counter
+import argparse
+import contextlib
+import inspect
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import logs
+
+
+def legacy_log_print(*msg):
+  """Прежний log_print"""
+  su = 'socket_utils.py' in inspect.stack()[1].filename
+  frame = inspect.stack()[2] if su else inspect.stack()[1]
+  clicksource = frame.function
+  filename = frame.filename.split('/')[-1]
+  if filename == '__init__.py':
+    filename = frame.filename.split('/')[-2] + '/'
+  lineno = frame.lineno
+
+  timestamp = datetime.now()
+  time_str = timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+  msg_parts = [
+    time_str,
+    '(SU)' if su else None,
+    clicksource,
+    f'{filename}:{lineno}',
+    ' '.join(map(str, msg))
+  ]
+  line = ' - '.join(filter(None, msg_parts))
+
+  print(line)
+
+  log_path = os.path.join(logs.LOG_DIR, timestamp.strftime('%Y/%m/%d'))
+  os.makedirs(log_path, exist_ok=True)
+  full_path = os.path.join(log_path, f"{timestamp.strftime('%H')}.log")
+  with open(full_path, 'a', encoding='utf-8') as f:
+    f.write(line + '\n')
+
+
+def hot_path(log, count: int):
+  """Вызов из глубины стека - как из DAGNode.process внутри пула потоков"""
+
+  def level(depth: int):
+    if depth:
+      return level(depth - 1)
+    for index in range(count):
+      log('🤛 set dag input', index, {'key': (1,), 'new_value': (21.4, 1700000000.0)})
+
+  level(20)
+
+
+def measure(name: str, log, count: int, drain=None) -> dict:
+  start = perf_counter()
+  hot_path(log, count)
+  call = perf_counter() - start
+  if drain is not None:
+    drain()
+  total = perf_counter() - start
+  return {'name': name, 'lines': count, 'call_lines_per_sec': round(count / call),
+          'total_lines_per_sec': round(count / total), 'us_per_call': round(call / count * 1e6, 2)}
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='log_print benchmark')
+  parser.add_argument('--lines', type=int, default=20000)
+  parser.add_argument('--json', action='store_true', help='Результат в JSON')
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, 'w') as devnull:
+    logs.LOG_DIR = log_dir
+    with contextlib.redirect_stdout(devnull):
+      results = [measure('legacy', legacy_log_print, args.lines),
+                 measure('current', logs.log_print, args.lines, logs.log_writer.flush)]
+      logs.log_writer.close()
+
+  if args.json:
+    print(json.dumps(results))
+  else:
+    for result in results:
+      print(f"{result['name']:>8}: {result['call_lines_per_sec']:9d} lines/s in caller, "
+            f"{result['total_lines_per_sec']:9d} lines/s incl. write, {result['us_per_call']:8.2f} us/call")
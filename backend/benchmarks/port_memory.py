@@ -0,0 +1,167 @@
+"""
+Память на порт: текущие Port/Device (__slots__, общие строки и values_variant)
+против прежнего представления (__dict__, копии списков и строк из строк БД).
+Замер после загрузки и после одного income_value на порт (история значений, seq).
+
+Запуск из каталога backend:
+  python -m benchmarks.port_memory --ports 10000 --ports-per-device 8
+"""
+from datetime import datetime
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.devices import Device, Port
+from utils.configs import config
+from utils.socket_utils import connection_manager
+
+PORT_KINDS = [
+  ('temperature', 'Temperature', 'numeric', '°C', [-40, 125, 0.1, 1], 'Measured temperature value'),
+  ('humidity', 'Humidity', 'numeric', '%', [0, 100, 1, 0], 'Measured relative humidity'),
+  ('battery', 'Battery', 'numeric', '%', [0, 100, 1, 0], 'Remaining battery in %'),
+  ('linkquality', 'Linkquality', 'numeric', 'lqi', [0, 255], 'Link quality (signal strength)'),
+  ('state', 'State', 'binary', None, ['OFF', 'ON'], 'On/off state of the switch'),
+  ('occupancy', 'Occupancy', 'binary', None, [False, True], 'Indicates whether the device detected occupancy'),
+  ('voltage', 'Voltage', 'numeric', 'mV', None, 'Voltage of the battery in millivolts'),
+  ('power', 'Power', 'numeric', 'W', [0, 3680, 0.1, 1], 'Instantaneous measured power'),
+]
+
+
+def fresh(value):
+  """Новая копия значения - как после чтения строки из БД"""
+  if isinstance(value, str):
+    return value.encode().decode()
+  if isinstance(value, list):
+    return [fresh(item) for item in value]
+  return value
+
+
+class LegacyPort:
+  """Прежний Port: те же атрибуты, что и до __slots__, без истории значений и seq"""
+
+  def __init__(self, _device, **kwargs):
+    self._id = kwargs['id']
+    self.code = kwargs['code']
+    self.label = kwargs['label']
+    self.access = kwargs['access']
+    self.type = kwargs['type']
+    self.values_variant = kwargs['values_variant']
+    self.description = kwargs['description']
+    self.name = kwargs['name']
+    self.mode = kwargs['mode']
+    self.unit = kwargs['unit']
+    self.device_id = kwargs['device_id']
+    self.device = _device
+    self.value = None
+    self.value_raw = None
+    self.last_update: datetime = None
+    self.last_send: datetime = None
+    self.subscriber = []
+    if self.type == 'numeric' and self.values_variant:
+      self.values_variant += [None] * (4 - len(self.values_variant))
+
+  def income_value(self, value_raw):
+    """Состояние, которое прежний income_value оставлял в порту (рассылка логов не хранится)"""
+    self.last_update = datetime.now()
+    self.value_raw = value_raw
+    if self.type == 'binary' and self.values_variant:
+      self.value = [0, 255][self.values_variant.index(value_raw)]
+    else:
+      self.value = value_raw
+
+
+class LegacyDevice:
+  """Прежнее представление устройства (до __slots__)"""
+
+  def __init__(self, app, connector, params):
+    self.app = app
+    self.connector = connector
+    for key in ['params', 'id', 'code', 'name', 'type', 'model', 'vendor', 'description', 'connection_id',
+                'location_id']:
+      setattr(self, key, params[key])
+    self.ports = {}
+    self.port_codes = {}
+    self.prev_state = None
+
+
+class NullConnector:
+  def add_device(self, device):
+    pass
+
+
+def rows(ports: int, ports_per_device: int) -> (list, list):
+  random.seed(1)
+  devices = []
+  port_rows = []
+  for device_id in range(1, ports // ports_per_device + 2):
+    devices.append({'params': {}, 'id': device_id, 'code': f'0x{device_id:016x}', 'name': f'device {device_id}',
+                    'type': fresh('EndDevice'), 'model': fresh('WSDCGQ11LM'), 'vendor': fresh('Aqara'),
+                    'description': fresh('Temperature, humidity and pressure sensor'), 'connection_id': 1,
+                    'location_id': None})
+    for code, label, port_type, unit, variant, description in random.sample(PORT_KINDS, ports_per_device):
+      if len(port_rows) >= ports:
+        break
+      port_rows.append({'id': len(port_rows) + 1, 'code': fresh(code), 'label': fresh(label), 'access': 1,
+                        'type': fresh(port_type), 'values_variant': fresh(variant), 'description': fresh(description),
+                        'name': fresh(code), 'mode': fresh('exposes'), 'unit': fresh(unit), 'device_id': device_id})
+  return devices, port_rows
+
+
+def sample_value(port):
+  """Значение от устройства: последний вариант для binary, число для остальных"""
+  if port.type == 'binary' and port.values_variant:
+    return port.values_variant[-1]
+  return 21.4
+
+
+def measure(device_class, port_class, devices: list, port_rows: list, with_value: bool = False) -> (int, list):
+  connector = NullConnector()
+  gc.collect()
+  tracemalloc.start()
+  start = tracemalloc.get_traced_memory()[0]
+  # Строки БД создаются внутри замера: учитывается то, что остается в памяти после загрузки
+  devices = [{key: fresh(value) for key, value in item.items()} for item in devices]
+  port_rows = [{key: fresh(value) for key, value in row.items()} for row in port_rows]
+  objects = {item['id']: device_class(None, connector, item) for item in devices}
+  ports = []
+  for row in port_rows:
+    device = objects[row['device_id']]
+    port = port_class(**row, _device=device)
+    device.ports[row['id']] = port
+    device.port_codes[row['code']] = row['id']
+    ports.append(port)
+  if with_value:
+    for port in ports:
+      port.income_value(sample_value(port))
+    connection_manager.logs_queue.clear()  # События для веб-сокетов к памяти порта не относятся
+  del devices, port_rows
+  gc.collect()
+  used = tracemalloc.get_traced_memory()[0] - start
+  tracemalloc.stop()
+  return used, (objects, ports)
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Port/Device memory benchmark')
+  parser.add_argument('--ports', type=int, default=10000)
+  parser.add_argument('--ports-per-device', type=int, default=6)
+  args = parser.parse_args()
+
+  config['logs']['level'] = 'warning'  # income_value не пишет строки логов в консоль и файл
+  config['timeseries']['enabled'] = False
+  devices, port_rows = rows(args.ports, min(args.ports_per_device, len(PORT_KINDS)))
+  print(f'ports: {len(port_rows)}, devices: {len(devices)}, history_size: {config["ports"].get("history_size")}')
+  for title, with_value in (('loaded', False), ('after one income_value per port', True)):
+    legacy, keep = measure(LegacyDevice, LegacyPort, devices, port_rows, with_value)
+    del keep
+    current, keep = measure(Device, Port, devices, port_rows, with_value)
+    del keep
+    print(title)
+    print(f'  legacy:  {legacy / 2 ** 20:8.2f} MB, {legacy / len(port_rows):7.0f} bytes/port (incl. devices)')
+    print(f'  current: {current / 2 ** 20:8.2f} MB, {current / len(port_rows):7.0f} bytes/port (incl. devices)')
+    print(f'  saved:   {(1 - current / legacy) * 100:7.1f} %')
@@ -0,0 +1,74 @@
+"""
+Кодирование сообщений веб-сокета: json.dumps(default=serialize_datetime) против компактной раскладки
+(compact JSON) и MessagePack. CPU на сообщение и байты в кадре на типичном потоке от одного
+сообщения zigbee: лог коннектора, income_value (log + port), set_input, update_params.
+
+Запуск из каталога backend:
+  python -m benchmarks.ws_encoding --messages 100000
+"""
+from time import perf_counter, time
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import ws_codec
+
+
+def sample_messages() -> list:
+  ts = time()
+  return [
+    {'type': 'log', 'level': 'info', 'permission': 'admin', 'message': 'Zigbee2mqtt get value',
+     'device_id': 12, 'class_name': 'Zigbee2mqttConnector', 'value': {'temperature': 21.4, 'linkquality': 87},
+     'ts': ts},
+    {'type': 'log', 'level': 'value', 'permission': 'admin', 'message': 'income_value temperature',
+     'device_id': 12, 'pin_id': 341, 'pin_name': 'temperature', 'direction': 'in', 'value': 21.4,
+     'value_raw': 21.4, 'ts': ts},
+    {'type': 'port', 'level': 'value', 'permission': 'all', 'pin_id': 341, 'value': 21.4, 'value_raw': 21.4,
+     'action': 'in', 'ts': ts},
+    {'type': 'log', 'level': 'value', 'permission': 'root', 'message': '🤛 set dag input', 'dag_id': 140189917883024,
+     'dag_port_id': 'default', 'direction': 'in', 'class_name': 'AggNode', 'value': 21.4, 'ts': ts},
+    {'type': 'dag', 'action': 'update_params', 'data': {'id': 140189917883024, 'params': {'value': 21.4}}},
+  ]
+
+
+def run(encoding: str, messages: list, count: int) -> dict:
+  start = perf_counter()
+  size = 0
+  for index in range(count):
+    payload = ws_codec.encode(messages[index % len(messages)], encoding)
+    size += len(payload) if isinstance(payload, bytes) else len(payload.encode())
+  elapsed = perf_counter() - start
+  return {'encoding': encoding, 'us_per_msg': round(elapsed / count * 1e6, 3), 'bytes_per_msg': round(size / count, 1)}
+
+
+def run_legacy(messages: list, count: int) -> dict:
+  """Прежний путь: json.dumps на каждое сообщение (и на каждого клиента)"""
+  start = perf_counter()
+  size = 0
+  for index in range(count):
+    size += len(json.dumps(messages[index % len(messages)], default=ws_codec.serialize_datetime).encode())
+  elapsed = perf_counter() - start
+  return {'encoding': 'legacy json.dumps', 'us_per_msg': round(elapsed / count * 1e6, 3),
+          'bytes_per_msg': round(size / count, 1)}
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Websocket encoding benchmark')
+  parser.add_argument('--messages', type=int, default=100000)
+  parser.add_argument('--json', action='store_true', help='Результат в JSON')
+  args = parser.parse_args()
+
+  messages = sample_messages()
+  results = [run_legacy(messages, args.messages)]
+  results += [run(encoding, messages, args.messages) for encoding in ws_codec.encodings()]
+  if 'msgpack' not in ws_codec.encodings():
+    print('msgpack не установлен: pip install msgpack', file=sys.stderr)
+
+  if args.json:
+    print(json.dumps(results))
+  else:
+    for result in results:
+      print(f"{result['encoding']:>18}: {result['us_per_msg']:7.2f} us/msg, {result['bytes_per_msg']:7.1f} bytes/msg")
@@ -12,9 +12,10 @@ class InputPinClass(BasePin):
     {'name': 'default', 'description': 'Выходные данные'}
   ]
 
-  async def set_param(self, name: str, value: any, send_update: bool = True):
+  def apply_param(self, name: str, value: any) -> bool:
     prev_value = self.params.get(name)
-    await BasePin.set_param(self, name, value, send_update)
+    if not BasePin.apply_param(self, name, value):
+      return False
     if name == 'pin_id':
       from models.devices import Devices
       devices = Devices()
@@ -22,6 +23,25 @@ class InputPinClass(BasePin):
         devices.ports[int(prev_value)].unsubscribe(self)
       if int(value) in devices.ports:
         devices.ports[int(value)].subscribe(self)
+        self.seed_inputs(devices.ports[int(value)])
+    return True
+
+  def seed_inputs(self, port):
+    """
+    Передает известное значение порта (в т.ч. восстановленное после перезапуска) во входы следующих узлов
+    без их запуска. Восстановленное значение помечается 'restored': True - узел может его игнорировать
+    """
+    if port.value is None or port.last_update is None:
+      return
+    data = {
+      'key': (port.device_id, port._id, port.code, id(self)),
+      'new_value': (port.value, port.last_update.timestamp()),
+    }
+    if port.restored:
+      data['restored'] = True
+    for input_type, output_node, children_group in self.outputs.get('default', []):
+      if input_type == 'in' and children_group not in output_node.input_values:
+        output_node.set_input(data, children_group, 'restored value' if port.restored else 'port value')
 
   def income_value(self, key, new_value, prev_value):
     # key (pin.device_id, pin._id, pin.code)
@@ -30,7 +50,7 @@ class InputPinClass(BasePin):
       'key': key,
       'new_value': new_value,
     }
-    log_print('🤖 input pin income_value', data)
+    log_print('🤖 input pin income_value', data, level='debug')
     if prev_value is not None:
       data['prev_value'] = prev_value
     self.set_output(data)
@@ -1,4 +1,5 @@
 from models.dag_node import DAGNode
+from models.rolling_window import RollingWindow
 from time import sleep
 from time import time
 from utils.logs import log_print
@@ -10,8 +11,9 @@ class AggNode(DAGNode):
   version = '0.0'
   description = 'Агрегация данных'
   public: bool = True
-  values = None
+  window: RollingWindow = None
   max_count = 100
+  ordered_modes = ('median', 'percentile')  # Режимы, которым нужен отсортированный список
 
   input_groups = [
     {'name': 'default', 'description': 'Значение'},
@@ -21,7 +23,15 @@ class AggNode(DAGNode):
      'description': 'Режим агрегации',
      'default': 'agg',
      'type': 'select',
-     'items': ['agg', 'max', 'min', 'sum', 'avg'],
+     'items': ['agg', 'max', 'min', 'sum', 'avg', 'median', 'percentile', 'stddev', 'rate'],
+     'public': False
+     },
+    {'name': 'percentile',
+     'description': 'Перцентиль для режима percentile',
+     'default': 90,
+     'type': 'float',
+     'min': 0,
+     'max': 100,
      'public': False
      },
     {'name': 'ttl',
@@ -30,6 +40,13 @@ class AggNode(DAGNode):
      'type': 'int',
      'public': False
      },
+    {'name': 'max_count',
+     'description': 'Максимальное количество значений. 0 - без ограничения (только при заданном ttl)',
+     'default': max_count,
+     'type': 'int',
+     'min': 0,
+     'public': False
+     },
     {
       'name': 'channel',
       'description': 'Обработка данных',
@@ -45,6 +62,39 @@ class AggNode(DAGNode):
 
   sub_title = ''
 
+  def get_window(self) -> RollingWindow:
+    """Окно под текущие параметры. При смене режима значения переносятся в новое окно"""
+    keyed = self.params['channel'] == 1
+    ordered = self.params['mode'] in self.ordered_modes
+    max_count = self.params.get('max_count', self.max_count)
+    if max_count <= 0 and self.params['ttl'] <= 0:
+      max_count = self.max_count  # Окно без ограничений не допускаем
+    window = self.window
+    if window is None or window.keyed != keyed or window.ordered != (ordered or keyed):
+      self.window = RollingWindow(ordered=ordered, keyed=keyed)
+      if window is not None:
+        for key, (value, ts, _) in window.entries.items():
+          self.window.push(value, ts, key if keyed else None)
+    self.window.max_count = max_count
+    self.window.ttl = self.params['ttl']
+    return self.window
+
+  def get_state(self) -> dict:
+    """
+    Окно без ключей. Ключи источников содержат id() узлов по пути события и после перезапуска
+    не совпадают ни с одним новым ключом - окно с ключами не сохраняется
+    """
+    if self.window is None or self.window.keyed:
+      return {'entries': []}
+    return {'entries': [[None, value, ts] for value, ts, _ in self.window.entries.values()]}
+
+  def set_state(self, state: dict):
+    if state.get('keyed'):  # Записи прежнего формата с ключами
+      return
+    self.window = RollingWindow(ordered=self.params['mode'] in self.ordered_modes, keyed=False)
+    for _, value, ts in state.get('entries', []):
+      self.window.push(value, ts, None)
+
   def execute(self, input_keys: list):
     key = self.input_values['default']['key']
     value, ts = self.input_values['default']['new_value']
@@ -52,36 +102,27 @@ class AggNode(DAGNode):
       if isinstance(value, str):
         value = float(value)
 
-      if self.params['channel'] == 1:
-        if self.values is None:
-          self.values = {}
-        elif self.params['ttl'] > 0:
-          for k, v in self.values.items():
-            if time() - v[1] > self.params['ttl']:
-              del self.values[k]
-        self.values[key] = (value, ts)
-        values = self.values.items()
-      else:
-        if self.values is None:
-          self.values = []
-        elif self.params['ttl'] > 0:
-          while len(self.values) > 0 and time() - self.values[0][1] > self.params['ttl']:
-            self.values.pop(0)
-        self.values.append((value, ts))
-        if len(self.values) > self.max_count:
-          self.values.pop(0)
-        values = self.values
+      window = self.get_window()
+      window.expire(time())
+      window.push(value, ts, key)
 
-      if self.params['mode'] == 'agg':
-        value = sum([v[0] for v in values]) / len(values)
-      elif self.params['mode'] == 'max':
-        value = max([v[0] for v in values])
-      elif self.params['mode'] == 'min':
-        value = min([v[0] for v in values])
-      elif self.params['mode'] == 'sum':
-        value = sum([v[0] for v in values])
-      elif self.params['mode'] == 'avg':
-        value = sum([v[0] for v in values]) / len(values)
+      mode = self.params['mode']
+      if mode in ['agg', 'avg']:
+        value = window.mean
+      elif mode == 'max':
+        value = window.max
+      elif mode == 'min':
+        value = window.min
+      elif mode == 'sum':
+        value = window.sum
+      elif mode == 'median':
+        value = window.median
+      elif mode == 'percentile':
+        value = window.percentile(self.params.get('percentile', 90))
+      elif mode == 'stddev':
+        value = window.stddev
+      elif mode == 'rate':
+        value = window.rate
       self.set_output(value)
     except Exception as e:
       log_print(f"Error: {e}")
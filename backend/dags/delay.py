@@ -1,5 +1,6 @@
 from models.dag_node import DAGNode
-from time import sleep
+from orchestrator.executor import dag_executor
+from orchestrator.timers import timer_service, Timer
 from time import time
 from utils.logs import log_print
 from utils.socket_utils import connection_manager
@@ -35,6 +36,8 @@ class DelayNode(DAGNode):
 
   sub_title = 'Delay: {delay_seconds} seconds'
 
+  timer: Timer = None
+
   def send_update(self):
     value = self.params.get('out_value', -1)
     if value == -1:
@@ -49,10 +52,46 @@ class DelayNode(DAGNode):
     # log_print(f"Node {self.name} finished at {time()}. Delay: {self.params['delay_seconds']} seconds.")
     self.set_output(value)
 
+  def _on_timer(self):
+    with self._lock:
+      # Таймер остановлен или перезапущен, пока колбэк ждал в очереди
+      if self.timer is None or self.timer.active:
+        return
+      self.timer = None
+      self.state_version += 1
+      self.updated_output = {}
+      self.send_update()
+      self._run_next()
+
+  def cancel_timer(self):
+    if self.timer is not None:
+      self.timer.cancel()
+      self.timer = None
+
+  def stop_thread(self):
+    super().stop_thread()
+    self.cancel_timer()
+
+  def get_state(self) -> dict:
+    if self.timer is None or not self.timer.active:
+      return {'deadline': None}
+    return {'deadline': time() + self.timer.remaining, 'start': self.input_values.get('start')}
+
+  def set_state(self, state: dict):
+    if not state.get('deadline'):
+      return
+    if state.get('start') is not None:
+      self.input_values['start'] = state['start']
+    self.cancel_timer()
+    # Срок истек, пока сервер был остановлен - срабатывает сразу
+    self.timer = timer_service.arm(state['deadline'] - time(), dag_executor.submit, self, self._on_timer)
+
   def execute(self, input_keys: list):
     # Остановка узла
+    if 'stop' in input_keys or 'start' in input_keys:
+      self.cancel_timer()
+
     if 'stop' in input_keys:
-      self.stop_thread()
       self.input_values['stop'] = None
       connection_manager.broadcast_log(
         level='debug',
@@ -69,5 +108,5 @@ class DelayNode(DAGNode):
         permission='root',
         dag=self,
       )
-      self.thread.submit(lambda x: sleep(x), self.params['delay_seconds'])  # Синхронная задержка
-      self.thread.submit(lambda x: self.send_update(), 0)  # Асинхронное обновление
+      # Общий сервис таймеров: по окончании задержки отправка выполняется в очереди узла
+      self.timer = timer_service.arm(self.params['delay_seconds'], dag_executor.submit, self, self._on_timer)
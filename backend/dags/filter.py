@@ -39,6 +39,13 @@ class FilterNode(DAGNode):
 
   sub_title = ''
 
+  def get_state(self) -> dict:
+    return {'prev_value': self.prev_value, 'prev_send': self.prev_send}
+
+  def set_state(self, state: dict):
+    self.prev_value = state.get('prev_value')
+    self.prev_send = state.get('prev_send', 0)
+
   def execute(self, input_keys: list):
     value = self.input_values.get('value', {'new_value': (0, 0)})['new_value'][0]
     if self.params['state'] == 0:
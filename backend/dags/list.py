@@ -41,6 +41,12 @@ class ListNode(DAGNode):
 
   sub_title = '{list}'
 
+  def get_state(self) -> dict:
+    return {'index': self.params['index']}
+
+  def set_state(self, state: dict):
+    self.params['index'] = state.get('index', self.params['index'])
+
   def execute(self, input_keys: list):
     if 'next' in input_keys:
       self.params['index'] += 1
@@ -1,7 +1,7 @@
 from models.dag_node import DAGNode
-from time import sleep
+from orchestrator.executor import dag_executor
+from orchestrator.timers import timer_service, Timer
 from time import time
-import concurrent.futures
 from crontab import CronTab
 from datetime import datetime
 from utils.logs import log_print
@@ -52,16 +52,25 @@ class SchedulerNode(DAGNode):
 
   sub_title = '{scheduler}'
 
+  timer: Timer = None
+
   def __init__(self):
     super().__init__()
-    self.stop_thread()
+    self.calc_new_schedule()
+
+  def cancel_timer(self):
+    if self.timer is not None:
+      self.timer.cancel()
+      self.timer = None
 
-    self.thread = concurrent.futures.ThreadPoolExecutor(max_workers=1)
-    self.thread.submit(self.run_step)
+  def stop_thread(self):
+    super().stop_thread()
+    self.cancel_timer()
 
-  async def set_param(self, name: str, value: any, send_update: bool = True):
-    await DAGNode.set_param(self, name, value, send_update)
-    name in ['scheduler', 'set'] and self.calc_new_schedule()
+  def apply_param(self, name: str, value: any) -> bool:
+    applied = DAGNode.apply_param(self, name, value)
+    applied and name in ['scheduler', 'set'] and self.calc_new_schedule()
+    return applied
 
   @property
   def scheduler_str(self):
@@ -86,6 +95,10 @@ class SchedulerNode(DAGNode):
     self._run_next()
 
   def calc_new_schedule(self):
+    with self._lock:
+      self._calc_new_schedule()
+
+  def _calc_new_schedule(self):
     if self.prev_scheduler_str != self.scheduler_str:
       self.prev_scheduler_str = self.scheduler_str
       # log_print(datetime.now(), 'SchedulerNode new shadule', id(self), self.scheduler_str)
@@ -96,13 +109,10 @@ class SchedulerNode(DAGNode):
         dag=self,
       )
       self.run_at = None
+      self.cancel_timer()
       try:
         self.cron = CronTab(self.scheduler_str)
-        self.run_at = time() + self.cron.next(default_utc=False)
-
-        ts_end_minutes = 6 - time() % 5
-        if ts_end_minutes > 1:
-          sleep(ts_end_minutes - 1)
+        self.schedule_next()
       except Exception as e:
         # log_print(datetime.now(), 'SchedulerNode new shadule error', id(self), e)
         connection_manager.broadcast_log(
@@ -112,17 +122,37 @@ class SchedulerNode(DAGNode):
           dag=self,
         )
 
-  def run_step(self):
-    self.calc_new_schedule()
+  def next_run_at(self, after: float = None):
+    """
+    Время следующего срабатывания строго после after (по умолчанию - сейчас).
+    После срабатывания after = run_at: при раннем запуске (до 0.5 с) тот же слот не выбирается повторно
+    """
+    now = time()
+    after = now if after is None else max(now, after)
+    delay = self.cron.next(now=after, default_utc=False)
+    return None if delay is None else after + delay
+
+  def schedule_next(self, delay: float = None, after: float = None):
+    """Взводит таймер общего сервиса на следующее время срабатывания"""
+    if delay is None:
+      self.run_at = self.next_run_at(after)
+      if self.run_at is None:
+        return
+      delay = max(0.0, self.run_at - time())
+    self.timer = timer_service.arm(delay, dag_executor.submit, self, self.run_step)
 
-    if self.run_at is not None and time() > self.run_at:
+  def run_step(self):
+    with self._lock:
+      # Расписание изменено или узел остановлен, пока колбэк ждал в очереди
+      if self.timer is None or self.timer.active or self.run_at is None:
+        return
+      self.timer = None
+      # Системное время могло сдвинуться за время ожидания
+      if time() < self.run_at - 0.5:
+        self.schedule_next(self.run_at - time())
+        return
       self.send()
-      sleep(1)
-      self.run_at = time() + self.cron.next(default_utc=False)
-
-    sleep(1)
-    if self.thread:
-      self.thread.submit(self.run_step)
+      self.schedule_next(after=self.run_at)
 
   def execute(self, input_keys: list):
     pass
@@ -6,6 +6,8 @@ class Json(TypeDecorator):
   def python_type(self):
     return object
 
+  cache_ok = True  # Без состояния - запросы с этим типом попадают в кэш скомпилированных выражений
+
   impl = types.Text
 
   def process_bind_param(self, value, dialect):
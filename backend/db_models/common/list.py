@@ -7,6 +7,8 @@ class List(TypeDecorator):
   def python_type(self):
     return object
 
+  cache_ok = True  # Без состояния - запросы с этим типом попадают в кэш скомпилированных выражений
+
   impl = types.String(1024)
 
   def process_bind_param(self, value, dialect):
@@ -1,12 +1,15 @@
 from typing import List, Optional, Any, Union
-import multiprocessing
-import concurrent.futures
 
+from orchestrator.executor import dag_executor
+from orchestrator.metrics import NodeMetrics
+from orchestrator.propagation import Wave, current_wave, propagation_mode
 from utils.socket_utils import connection_manager
 from utils.logs import log_print
 import os
 from datetime import datetime
+from time import perf_counter
 import asyncio
+import threading
 
 
 class DAGNode:
@@ -30,7 +33,21 @@ class DAGNode:
   params_groups = []  # Группы параметров
   output_groups = []  # Группы выходов
 
-  thread = None
+  root_dag = None  # rootDag, в который добавлен узел
+  source_id = None  # id узла в JSON, из которого он создан (orchestrator.json или шаблон)
+  state_version = 0  # Увеличивается при каждом выполнении - для сохранения только изменившихся узлов
+
+  # Выполнять execute в пуле процессов (для тяжелых вычислений). Узел должен хранить состояние
+  # только во входах, параметрах и атрибутах из process_state - они передаются в процесс и обратно
+  run_in_process: bool = False
+  process_state: tuple = ()
+
+  # Общий параметр для узлов с входами: обрабатывать только последнее значение входа, пока узел занят
+  coalesce_param = {'name': 'coalesce',
+                    'description': 'Только последнее значение входов, пока узел занят (через запятую, * - все)',
+                    'type': 'str',
+                    'default': '',
+                    'public': False}
 
   position = None
   page = 'main'
@@ -44,6 +61,12 @@ class DAGNode:
     self.outputs = {}  # Выходы узла (ссылки на другие узлы)
     self.input_values = {}  # Значения входов (параметры)
     self.updated_output = {}  # Обновленные значения выходов
+    self._lock = threading.RLock()  # Узел выполняется последовательно
+    self._pending_lock = threading.Lock()
+    self._pending_keys: set = None  # Входы, ожидающие объединенного запуска
+    self.coalesced = 0  # Запуски, объединенные с ожидающим
+    self.dropped = 0  # Значения входов, замененные более новыми до обработки
+    self.metrics = NodeMetrics()
 
     self.params = {param['name']: param.get('default', None) for param in (self.params_groups or {})}
     self.position = [100, 100]
@@ -51,6 +74,11 @@ class DAGNode:
     if not self.code:
       self.code = self.code or self.name
 
+  def __init_subclass__(cls, **kwargs):
+    super().__init_subclass__(**kwargs)
+    if cls.input_groups and not any(param['name'] == 'coalesce' for param in cls.params_groups or []):
+      cls.params_groups = [*(cls.params_groups or []), DAGNode.coalesce_param]
+
   def kill(self):
     """Останавливает выполнение узла"""
     self.stop_thread()
@@ -106,12 +134,12 @@ class DAGNode:
 
     return await connection_manager.broadcast(data)
 
-  async def set_param(self, name: str, value: any, send_update: bool = True):
-    """Устанавливает параметр узла"""
+  def apply_param(self, name: str, value: any) -> bool:
+    """Проверяет и устанавливает параметр без отправки обновления. Можно вызывать из любого потока"""
     try:
       if name not in self.params:
         log_print(f"💥 {self} {id(self)} Error: Param {name} not found. Value {value}")
-        return
+        return False
       for param in self.params_groups:
         if param['name'] != name:
           continue
@@ -130,10 +158,6 @@ class DAGNode:
           value = param['min'] + ((value - param['min']) // param['step']) * param['step']
 
       self.params[name] = value
-      if send_update:
-        await connection_manager.broadcast({"type": "dag",
-                                            "action": "update_params",
-                                            "data": {"id": self.id, "params": {name: value}}})
       connection_manager.broadcast_log(level='value',
                                        message='🤛 set dag param',
                                        permission='root',
@@ -142,18 +166,41 @@ class DAGNode:
                                        dag_port_id=name,
                                        value=value)
       # log_print('🤛 set dag param', id(self), self.__class__, name, value)
+      return True
 
     except Exception as e:
       log_print(f"Error setting param {name}={value}: {e}")
+      return False
+
+  async def set_param(self, name: str, value: any, send_update: bool = True):
+    """Устанавливает параметр узла"""
+    if self.apply_param(name, value) and send_update:
+      await connection_manager.broadcast({"type": "dag",
+                                          "action": "update_params",
+                                          "data": {"id": self.id, "params": {name: self.params[name]}}})
 
   async def set_params(self, params: dict, send_update: bool = True):
     """Устанавливает параметры узла"""
     for name, value in params.items():
-      await self.set_param(name, value, False)
+      self.apply_param(name, value)
     if send_update:
       await connection_manager.broadcast(
         {"type": "dag", "action": "update_params", "data": {"id": self.id, "params": self.params}})
 
+  def set_params_threadsafe(self, params: dict, send_update: bool = True) -> dict:
+    """
+    Устанавливает параметры из потока выполнения узлов (связи типа param).
+    Значения применяются сразу, одно сообщение update_params отправляется через цикл событий веб-сокетов
+    """
+    applied = {name: self.params[name] for name, value in params.items() if self.apply_param(name, value)}
+    if applied and send_update:
+      self.send_params_threadsafe(applied)
+    return applied
+
+  def send_params_threadsafe(self, params: dict):
+    connection_manager.broadcast_threadsafe(
+      {"type": "dag", "action": "update_params", "data": {"id": self.id, "params": params}})
+
   def set_position(self, x: int, y: int):
     """Устанавливает позицию узла"""
     self.position = [x, y]
@@ -233,16 +280,76 @@ class DAGNode:
   def _execute(self, input_keys: list):
     """Метод для выполнения логики узла и передачи данных на выход."""
     self.updated_output = {}
-    self.execute(input_keys)
+    start = perf_counter()
+    try:
+      if self.run_in_process:
+        from orchestrator.process_pool import dag_process_pool
+        self.updated_output = dag_process_pool.execute(self, input_keys)
+      else:
+        self.execute(input_keys)
+    except Exception as e:
+      self.metrics.add_execute((perf_counter() - start) * 1000, e)
+      raise
+    self.metrics.add_execute((perf_counter() - start) * 1000)
+    self.state_version += 1
     # self._run_next()
     # self.thread.shutdown(wait=False)
     # self.thread = None
 
+  def get_state(self) -> Optional[dict]:
+    """Внутреннее состояние узла (JSON) для восстановления после перезапуска. Переопределяется в узлах"""
+    return None
+
+  def set_state(self, state: dict):
+    """Восстанавливает состояние, сохраненное get_state. Вызывается после установки параметров"""
+
+  def checkpoint_path(self) -> str:
+    """Постоянный адрес узла: id из JSON, для узлов шаблона - через адрес шаблона"""
+    key = str(self.source_id if self.source_id is not None else self.id)
+    if isinstance(self.root_dag, DAGNode):
+      return f'{self.root_dag.checkpoint_path()}/{key}'
+    return key
+
+  def next_nodes(self):
+    """Узлы, которые запускаются выходами этого узла"""
+    for outputs in self.outputs.values():
+      for input_type, output_node, _ in outputs:
+        if input_type == 'in':
+          yield output_node
+
   def _run_next(self):
-    log_print('🏃 run next', id(self), self.__class__)
+    if current_wave() is None and propagation_mode() == 'wave':
+      # Новое событие: волна собирается и выполняется в очереди узла. Выходы копируются сейчас,
+      # входы следующих узлов записываются только при запуске волны - события подряд не затирают
+      # входы волны, которая еще ждет в очереди
+      dag_executor.submit(self, self._run_wave, dict(self.updated_output))
+      return
+    self._propagate(self.updated_output)
+
+  def _run_wave(self, updated_output: dict):
+    wave = Wave()
+    with wave.collect():
+      self._propagate(updated_output)
+    wave.run()
+
+  def _set_output_params(self, need_params: dict):
+    """Связи типа param: {узел: {параметр: значение}} применяются сразу, по одному обновлению на узел"""
+    wave = current_wave()
+    for output_node, params in need_params.items():
+      try:
+        applied = output_node.set_params_threadsafe(params, send_update=wave is None)
+        if wave is not None:
+          wave.add_params(output_node, applied)  # Обновление уйдет одним сообщением в конце волны
+      except Exception as e:
+        log_print(f"💥 {self} {id(self)} Error setting params {output_node}: {e}")
+
+  def _propagate(self, updated_output: dict):
+    log_print('🏃 run next', id(self), self.__class__, level='debug')
+    start = perf_counter()
     need_run = {}
+    need_params = {}
     # Передача данных на выход
-    for output_group, value in self.updated_output.items():
+    for output_group, value in updated_output.items():
       for input_type, output_node, children_group in self.outputs.get(output_group, []):
         try:
           if input_type == 'in':
@@ -252,43 +359,92 @@ class DAGNode:
               need_run[key] = set()
             need_run[key].add(children_group)
           elif input_type == 'param':
-            val = value.get('new_value', [0, 0])[0]
-            asyncio.run(output_node.set_param(children_group, val))
+            # Параметры собираются по узлам: одно обновление на узел за проход
+            if output_node not in need_params:
+              need_params[output_node] = {}
+            need_params[output_node][children_group] = value.get('new_value', [0, 0])[0]
           else:
             log_print(f"💥 {self} {id(self)} Unknown input type {input_type} for {output_node}")
         except Exception as e:
           log_print(f"💥 {self} {id(self)} Error setting output {output_node}: {e}")
 
+    self._set_output_params(need_params)
+
     # Запуск следующих в отдельном потоке
     for _node, keys in need_run.items():
       try:
         _node[1].process(keys)
       except Exception as e:
         log_print(f"💥 {self} {id(self)} Error running {_node}: {e}")
-    log_print('🏁 run next', id(self), self)
+    self.metrics.add_run_next((perf_counter() - start) * 1000)
+    log_print('🏁 run next', id(self), self, level='debug')
 
   def stop_thread(self):
-    try:
-      if self.thread is not None:
-        self.thread.shutdown(wait=False, cancel_futures=True)
-    except Exception as e:
-      pass
-    self.thread = None
+    """Отменяет задачи узла, которые еще ждут выполнения в общем пуле"""
+    dag_executor.cancel(self)
+    self._pending_keys = None
+
+  def get_stats(self, with_buckets: bool = True) -> dict:
+    """Статистика выполнения узла"""
+    return {
+      'id': self.id,
+      'code': self.code,
+      'queued': dag_executor.depth(self),
+      'coalesced': self.coalesced,
+      'dropped': self.dropped,
+      **self.metrics.get_json(with_buckets),
+    }
+
+  def coalesce_keys(self, input_keys) -> set:
+    """Входы из input_keys, для которых включен режим 'последнее значение'"""
+    ports = (self.params or {}).get('coalesce')
+    if not ports:
+      return set()
+    if ports == '*':
+      return set(input_keys)
+    return set(input_keys) & {port.strip() for port in str(ports).split(',')}
+
+  def _process(self, input_keys: list):
+    with self._lock:
+      self._execute(input_keys)
+      self._run_next()
+
+  def _process_pending(self):
+    with self._pending_lock:
+      input_keys, self._pending_keys = self._pending_keys, None
+    if input_keys:
+      self._process(list(input_keys))
+
+  def _submit_coalesced(self, input_keys: set):
+    with self._pending_lock:
+      if self._pending_keys is not None:
+        # Запуск уже ждет в очереди: он обработает последние значения входов
+        self.coalesced += 1
+        self.dropped += len(self._pending_keys & input_keys)
+        self._pending_keys |= input_keys
+        return
+      self._pending_keys = set(input_keys)
+    dag_executor.submit(self, self._process_pending)
 
   def process(self, input_keys: list):
     """Процесс обработки данных или выполнения операций с входами и выходами."""
-    # if self.thread is not None and self.thread.is_alive():
-    #   self.thread.terminate()
-    #
-    # self.thread = multiprocessing.Process(target=self._execute)
-    # self.thread.start()
-    log_print('🤸 process', id(self), self.__class__, input_keys)
-
-    self.stop_thread()
-
-    self.thread = concurrent.futures.ThreadPoolExecutor(max_workers=1)
-    self._execute(input_keys)
-    self.thread.submit(self._run_next)
+    log_print('🤸 process', id(self), self.__class__, input_keys, level='debug')
+    wave = current_wave()
+    if wave is None and propagation_mode() == 'wave':
+      wave = Wave()
+      wave.add(self, input_keys)
+      dag_executor.submit(self, wave.run)
+    elif wave is not None:
+      # Узел выполнится один раз за волну со всеми обновленными входами
+      wave.add(self, input_keys)
+    else:
+      # Выполнение в очереди узла общего пула: узел выполняется последовательно, разные узлы - параллельно
+      coalesce_keys = self.coalesce_keys(input_keys)
+      if coalesce_keys:
+        self._submit_coalesced(coalesce_keys)
+      input_keys = [key for key in input_keys if key not in coalesce_keys]
+      if input_keys:
+        dag_executor.submit(self, self._process, input_keys)
 
   def __repr__(self):
     return f"<DAGNode(name={self.name}, version={self.version})>"
@@ -0,0 +1,129 @@
+from collections import deque
+from typing import Iterable, Tuple
+
+
+class ExecutionPlan:
+  """
+  Скомпилированный план графа DAG-ов одного уровня (оркестратор или шаблон).
+  Собирается после загрузки и после каждого изменения графа.
+
+  - forward: (id(node), output_group) -> [(input_type, node, input_group)]
+  - reverse: (id(node), input_group) -> [(input_type, node, output_group)]
+  - incoming: id(node) -> [(node, output_group, input_type, input_group)] все входящие связи узла
+  - order: топологический порядок узлов по связям 'in'
+  - ranks: id(node) -> позиция в order
+  - cycles: списки id(node) найденных циклов
+  """
+
+  def __init__(self, nodes: Iterable, edges: Iterable[Tuple]):
+    self.nodes = {id(node): node for node in nodes}
+    self.forward = {}
+    self.reverse = {}
+    self.incoming = {}
+    successors = {key: [] for key in self.nodes}
+    for src, output_group, input_type, dst, input_group in edges:
+      self.forward.setdefault((id(src), output_group), []).append((input_type, dst, input_group))
+      self.reverse.setdefault((id(dst), input_group), []).append((input_type, src, output_group))
+      self.incoming.setdefault(id(dst), []).append((src, output_group, input_type, input_group))
+      if input_type == 'in' and id(src) in successors and id(dst) in successors:
+        successors[id(src)].append(id(dst))
+
+    components = self._find_components(successors)
+    self.cycles = [component for component in components
+                   if len(component) > 1 or component[0] in successors[component[0]]]
+    self.order = self._sort(successors, components)
+    self.ranks = {key: index for index, key in enumerate(self.order)}
+
+  def outputs(self, node, output_group: str) -> list:
+    return self.forward.get((id(node), output_group), [])
+
+  def inputs(self, node, input_group: str) -> list:
+    return self.reverse.get((id(node), input_group), [])
+
+  def incoming_edges(self, node) -> list:
+    return self.incoming.get(id(node), [])
+
+  @staticmethod
+  def _sort(successors: dict, components: list) -> list:
+    """
+    Алгоритм Кана на графе компонент сильной связности: каждый цикл сжимается в одну вершину,
+    после сортировки разворачивается на месте в исходном порядке узлов.
+    Узлы ниже цикла идут после всего цикла и в топологическом порядке между собой
+    """
+    position = {key: index for index, key in enumerate(successors)}
+    component_of = {}
+    for index, component in enumerate(components):
+      component.sort(key=position.get)
+      for key in component:
+        component_of[key] = index
+    # Компоненты в порядке первого узла - при равенстве порядок как в исходном списке
+    by_position = sorted(range(len(components)), key=lambda index: position[components[index][0]])
+
+    component_successors = {index: set() for index in range(len(components))}
+    indegree = dict.fromkeys(range(len(components)), 0)
+    for key, next_keys in successors.items():
+      for next_key in next_keys:
+        src, dst = component_of[key], component_of[next_key]
+        if src != dst and dst not in component_successors[src]:
+          component_successors[src].add(dst)
+          indegree[dst] += 1
+
+    order = []
+    queue = deque(index for index in by_position if indegree[index] == 0)
+    while queue:
+      index = queue.popleft()
+      order += components[index]
+      for next_index in sorted(component_successors[index], key=lambda item: position[components[item][0]]):
+        indegree[next_index] -= 1
+        if indegree[next_index] == 0:
+          queue.append(next_index)
+    return order
+
+  @staticmethod
+  def _find_components(successors: dict) -> list:
+    """Компоненты сильной связности (Тарьян, без рекурсии), включая одиночные узлы"""
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in successors:
+      if root in index:
+        continue
+      work = [(root, iter(successors[root]))]
+      index[root] = low[root] = len(index)
+      stack.append(root)
+      on_stack.add(root)
+      while work:
+        key, children = work[-1]
+        for child in children:
+          if child not in index:
+            index[child] = low[child] = len(index)
+            stack.append(child)
+            on_stack.add(child)
+            work.append((child, iter(successors[child])))
+            break
+          if child in on_stack:
+            low[key] = min(low[key], index[child])
+        else:
+          work.pop()
+          if work:
+            low[work[-1][0]] = min(low[work[-1][0]], low[key])
+          if low[key] == index[key]:
+            component = []
+            while True:
+              item = stack.pop()
+              on_stack.discard(item)
+              component.append(item)
+              if item == key:
+                break
+            components.append(component)
+    return components
+
+  def get_json(self) -> dict:
+    return {
+      'nodes': len(self.nodes),
+      'edges': sum(len(items) for items in self.forward.values()),
+      'order': [self.nodes[key].id for key in self.order],
+      'cycles': [[self.nodes[key].id for key in cycle] for cycle in self.cycles],
+    }
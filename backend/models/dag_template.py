@@ -60,6 +60,7 @@ class DAGTemplateBase(DAGNode, rootDag):
 
       for output_dags in self.output_groups:
         output_dags['pin'].set_root_tpl(self)
+      self.invalidate_plan()
 
     if 'dags' in self.template:
       dag_id_map = asyncio.create_task(self.create_from_json(self.template['dags']))
@@ -79,8 +80,9 @@ class DAGTemplateBase(DAGNode, rootDag):
   def code(self):
     return f'tpl:{self.name}|{self.version}'
 
-  async def set_param(self, param_name: str, value: any, send_update: bool = True):
-    await DAGNode.set_param(self, param_name, value, send_update)
+  def apply_param(self, param_name: str, value: any) -> bool:
+    if not DAGNode.apply_param(self, param_name, value):
+      return False
     value = self.params.get(param_name)
     print('🤓 dag set param', param_name, value)
     for param in self.params_groups:
@@ -89,12 +91,30 @@ class DAGTemplateBase(DAGNode, rootDag):
           if output[0] in ['in']:
             output[1].set_input(value, output[2])
           elif output[0] in ['param']:
-            await output[1].set_param(output[2], value)
+            output[1].set_params_threadsafe({output[2]: value})
         continue
+    return True
+
+  def plan_edges(self):
+    yield from rootDag.plan_edges(self)
+    for input_group in [*self.input_groups, *self.params_groups]:
+      if 'pin' not in input_group:
+        continue
+      for output in input_group.get('outputs', []):
+        if isinstance(output, tuple) and isinstance(output[1], DAGNode):
+          yield input_group['pin'], 'default', output[0], output[1], output[2]
+
+  def next_nodes(self):
+    for input_dag in self.input_groups:
+      for output in input_dag.get('outputs', []):
+        if output[0] in ['in'] and isinstance(output[1], DAGNode):
+          yield output[1]
+    yield from DAGNode.next_nodes(self)
 
   def execute(self, input_keys: List[str]):
     print('🤖 dag execute')
     execute_dags = {}
+    need_params = {}
     for input_dag in self.input_groups:
       if input_dag['name'] in input_keys:
         for output in input_dag['outputs']:
@@ -105,8 +125,10 @@ class DAGTemplateBase(DAGNode, rootDag):
             if output[2] not in execute_dags[output[1]]:
               execute_dags[output[1]].append(output[2])
           if output[0] in ['param']:
-            output[1].set_param(output[2], self.input_values.get(input_dag['name']))
+            value = self.input_values.get(input_dag['name']) or {}
+            need_params.setdefault(output[1], {})[output[2]] = value.get('new_value', [0, 0])[0]
 
+    self._set_output_params(need_params)
     for dag, input_keys in execute_dags.items():
       dag.process(input_keys)
 
@@ -12,22 +12,59 @@ from db_models.ports import Ports as DbPorts
 from models.connections import Connectors
 from typing import Union, List
 from models.dag_node import DAGNode
+from models.port_history import PortHistory
+from models.port_snapshot import save_snapshot, load_snapshot
+from utils.configs import config
+from utils.timeseries import timeseries_store
 import asyncio
 from utils.socket_utils import connection_manager
+from utils.logs import log_print
+from time import perf_counter
+import sys
+import threading
+import uuid
+
+_seq_lock = threading.Lock()
+_variants = {}  # (тип, значение)... -> общий кортеж values_variant для одинаковых портов
+
+
+def intern_str(value):
+  """Одна копия строки на все порты и устройства (типы, единицы, описания повторяются)"""
+  return sys.intern(value) if isinstance(value, str) else value
+
+
+def shared_variant(values_variant, size: int = 0):
+  """values_variant как общий неизменяемый кортеж, дополненный None до size"""
+  if not values_variant:
+    return None
+  values_variant = tuple(intern_str(value) for value in values_variant)
+  values_variant += (None,) * (size - len(values_variant))
+  # Ключ с типами: (0, 100) и (0.0, 100.0), True и 1 равны, но не взаимозаменяемы (round(value, 2.0) - ошибка)
+  key = tuple((type(value), value) for value in values_variant)
+  try:
+    return _variants.setdefault(key, values_variant)
+  except TypeError:  # Нехешируемые элементы
+    return values_variant
 
 
 class Port:
+  __slots__ = ('_id', 'code', 'label', 'access', 'type', 'values_variant', 'description', 'name', 'mode', 'unit',
+               'device_id', 'device', 'value', 'value_raw', 'last_update', 'last_send', 'subscriber', 'history',
+               'seq', 'restored')
+  last_seq = 0  # Последний номер изменения среди всех портов
+
   def __init__(self, _device, **kwargs):
     self._id = kwargs['id']
-    self.code = kwargs['code']
-    self.label = kwargs['label']
-    self.access = kwargs['access']
-    self.type = kwargs['type']
-    self.values_variant = kwargs['values_variant']
-    self.description = kwargs['description']
-    self.name = kwargs['name']
-    self.mode = kwargs['mode']
-    self.unit = kwargs['unit']
+    self.code = intern_str(kwargs['code'])
+    self.label = intern_str(kwargs['label'])
+    self.access = intern_str(kwargs['access'])
+    self.type = intern_str(kwargs['type'])
+    # set len of values_variant to 4 (min, max, step, didgits) (add None if not exist)
+    self.values_variant = shared_variant(kwargs['values_variant'], 4 if self.type == 'numeric' else 0)
+    self.description = intern_str(kwargs['description'])
+    self.name = intern_str(kwargs['name'])
+    self.mode = intern_str(kwargs['mode'])
+    self.unit = intern_str(kwargs['unit'])
     self.device_id = kwargs['device_id']  # device_id
 
     self.device = _device
@@ -35,12 +72,10 @@ class Port:
     self.value_raw = None
     self.last_update: datetime = None
     self.last_send: datetime = None
-    self.subscriber = []
-
-    if self.type == 'numeric':
-      # set len of values_variant to 4 (min, max, step, didgits) (add None if not exist)
-      if self.values_variant:
-        self.values_variant += [None] * (4 - len(self.values_variant))
+    self.subscriber = ()  # Кортеж заменяется целиком при подписке - обход без блокировок
+    self.history: PortHistory = None  # Создается при первом значении
+    self.seq = 0  # Номер последнего изменения значения
+    self.restored = False  # Значение восстановлено из снимка и еще не подтверждено устройством
 
   def info(self):
     return {
@@ -63,11 +98,21 @@ class Port:
     }
 
   def state(self):
-    return {
+    data = {
       'value': self.value,
       'value_raw': self.value_raw,
       'ts': self.last_update.timestamp() if self.last_update else None,
     }
+    if self.restored:
+      data['restored'] = True
+    return data
+
+  def restore(self, ts: float, value, value_raw):
+    """Последнее известное значение из снимка (без отправки подписчикам)"""
+    self.value = value
+    self.value_raw = value_raw
+    self.last_update = datetime.fromtimestamp(ts)
+    self.restored = True
 
   def get_value(self):
     return self.value
@@ -92,10 +137,21 @@ class Port:
       return value, self.values_variant[value > 0]
     return value, value
 
+  def record(self, ts: float, value):  # change seq, history in memory and write-behind store
+    self.restored = False
+    with _seq_lock:
+      Port.last_seq += 1
+      self.seq = Port.last_seq
+    if self.history is None:
+      self.history = PortHistory()
+    self.history.add(ts, value)
+    timeseries_store.add(self._id, ts, value)
+
   def set_value(self, value):  # set new value and send to device
     value, raw_value = self._value_to_raw(value)
     self.value = value
     self.last_send = datetime.now()
+    self.record(self.last_send.timestamp(), value)
     self.device.send_value(self, raw_value)
     connection_manager.broadcast_log(level='value',
                                      message=f'🤖 set port({self.code}) value',
@@ -130,6 +186,7 @@ class Port:
     self.value_raw = value_raw
     value = self._raw_to_value(value_raw)
     self.value = value
+    self.record(self.last_update.timestamp(), value)
 
     connection_manager.broadcast_log(level='value',
                                      message=f'income_value {self.code}',
@@ -156,13 +213,16 @@ class Port:
         print('skip subscriber', subscriber)
 
   def subscribe(self, subscriber):
-    self.subscriber.append(subscriber)
+    self.subscriber = (*self.subscriber, subscriber)
 
   def unsubscribe(self, subscriber):
-    self.subscriber = [item for item in self.subscriber if id(item) != id(subscriber)]
+    self.subscriber = tuple(item for item in self.subscriber if id(item) != id(subscriber))
 
 
 class Device:
+  __slots__ = ('app', 'connector', 'params', 'id', 'code', 'name', 'type', 'model', 'vendor', 'description',
+               'connection_id', 'location_id', 'ports', 'port_codes', 'prev_state')
+
   def __init__(self, app, connector, params):
     self.app = app
     self.connector = connector
@@ -170,10 +230,10 @@ class Device:
     self.id = params['id']
     self.code = params['code']
     self.name = params['name']
-    self.type = params['type']
-    self.model = params['model']
-    self.vendor = params['vendor']
-    self.description = params['description']
+    self.type = intern_str(params['type'])
+    self.model = intern_str(params['model'])
+    self.vendor = intern_str(params['vendor'])
+    self.description = intern_str(params['description'])
     self.connection_id = params['connection_id']
     self.location_id = params['location_id']
     self.connector.add_device(self)
@@ -235,6 +295,9 @@ class Devices(SingletonClass):
   devices: dict = None
   devices_names: dict = None
   ports: dict = None
+  load_stats: dict = None  # Время загрузки из БД
+  snapshot_seq: int = None  # Port.last_seq на момент последнего снимка
+  epoch: str = None  # Меняется при каждой загрузке портов: номера изменений seq из разных эпох несравнимы
 
   def __init__(self):
     if self.is_initialized:
@@ -248,44 +311,135 @@ class Devices(SingletonClass):
     print(f"Devices class initialized:")
     self.init_device()
 
+  def ports_state(self, since: int = None, epoch: str = None) -> dict:
+    """
+    Состояния портов. since - только порты, измененные после номера изменения since.
+    epoch - эпоха, в которой получен since: если сервер перезапущен или порты перезагружены, отдается полный снимок
+    """
+    with _seq_lock:
+      seq = Port.last_seq  # Все изменения до seq уже записаны в порты
+    full = since is None or epoch != self.epoch or since > seq
+    if full:
+      data = {port_id: port.state() for port_id, port in list(self.ports.items())}
+    else:
+      data = {port_id: port.state() for port_id, port in list(self.ports.items()) if port.seq > since}
+    data[0] = {'ts': datetime.now().timestamp(), 'seq': seq, 'epoch': self.epoch, 'full': full}
+    return {port_id: port for port_id, port in data.items() if port.get('ts') is not None}
+
   def add_port(self, port):
     if not isinstance(port, dict):
       port = port.__dict__
     port = {key: value for key, value in port.items() if not key.startswith('_')}
     self.ports[port['id']] = self.devices[port['device_id']].add_port(port)
 
-  def add_device(self, item):
+  def add_device(self, item, connector=None):
+    connector = connector or Connectors().connectors[item['connection_id']]
     self.devices[item['id']] = Device(self.app,
-                                      Connectors().connectors[item['connection_id']],
+                                      connector,
                                       {key: value for key, value in item.items()
                                        if not key.startswith('_')})
     self.devices_names[item['name']] = item['id']
-    if hasattr(self.devices[item['id']], 'add_device'):
-      Connectors().connectors[item.connection_id].add_device(self.devices[item['id']])
 
   def init_device(self):
+    """
+    Загрузка устройств и портов: по одному запросу на таблицу, только нужные колонки
+    (строки без ORM-объектов и identity map), порты создаются сразу в устройствах
+    """
+    start = perf_counter()
+    self.epoch = uuid.uuid4().hex
     self.devices = {}
+    self.devices_names = {}
+    self.ports = {}
+    connectors = Connectors().connectors
     with db_session() as db:
-      items = db.query(DbDevices).all()
-      connectors = Connectors().connectors
-      for item in items:
-        if item.connection_id in connectors:
-          self.add_device(item.__dict__)
-        else:
-          print(f"Device {item.name}({item.id}) not found in devices_class or connection_id not found in Connectors")
+      devices = db.query(DbDevices.id, DbDevices.code, DbDevices.name, DbDevices.type, DbDevices.model,
+                         DbDevices.vendor, DbDevices.description, DbDevices.params, DbDevices.connection_id,
+                         DbDevices.location_id).all()
+      devices_loaded = perf_counter()
+      ports = db.query(DbPorts.id, DbPorts.code, DbPorts.label, DbPorts.access, DbPorts.type, DbPorts.values_variant,
+                       DbPorts.description, DbPorts.name, DbPorts.mode, DbPorts.unit, DbPorts.device_id).all()
+    ports_loaded = perf_counter()
+
+    for item in devices:
+      item = item._asdict()
+      if item['connection_id'] in connectors:
+        self.add_device(item, connectors[item['connection_id']])
+      else:
+        print(f"Device {item['name']}({item['id']}) not found in devices_class or connection_id not found in Connectors")
 
-      ports = db.query(DbPorts).all()
-      for port in ports:
-        if port.device_id in self.devices:
-          self.add_port(port)
-        else:
-          print(f"Port {port.id} not found in devices[{port.device_id}]")
+    for port in ports:
+      port = port._asdict()
+      device = self.devices.get(port['device_id'])
+      if device is not None:
+        self.ports[port['id']] = device.add_port(port)
+      else:
+        print(f"Port {port['id']} not found in devices[{port['device_id']}]")
+
+    restored = self.restore_snapshot()
+    self.load_stats = {
+      'devices': len(self.devices),
+      'ports': len(self.ports),
+      'restored': restored,
+      'devices_query_ms': round((devices_loaded - start) * 1000, 3),
+      'ports_query_ms': round((ports_loaded - devices_loaded) * 1000, 3),
+      'build_ms': round((perf_counter() - ports_loaded) * 1000, 3),
+      'total_ms': round((perf_counter() - start) * 1000, 3),
+    }
+    log_print('Devices loaded', self.load_stats)
+
+  @property
+  def snapshot_path(self) -> str:
+    return os.path.abspath(config['ports']['snapshot_path'])
+
+  def save_snapshot(self, force: bool = False) -> bool:
+    """Сохраняет последние значения портов, если они менялись с прошлого снимка"""
+    seq = Port.last_seq
+    if not force and seq == self.snapshot_seq:
+      return False
+    items = [(port_id, port.last_update.timestamp(), port.value, port.value_raw)
+             for port_id, port in list(self.ports.items())
+             if port.last_update is not None and port.value is not None]
+    save_snapshot(self.snapshot_path, items)
+    self.snapshot_seq = seq
+    return True
+
+  def restore_snapshot(self) -> int:
+    """Восстанавливает значения портов из снимка. Возвращает количество восстановленных портов"""
+    count = 0
+    try:
+      for port_id, ts, value, value_raw in load_snapshot(self.snapshot_path):
+        port = self.ports.get(port_id)
+        if port is not None and port.value is None:
+          port.restore(ts, value, value_raw)
+          count += 1
+    except Exception as e:
+      log_print(f"💥 ports snapshot restore error: {e}")
+    self.snapshot_seq = Port.last_seq
+    return count
+
+
+async def snapshot_ports_loop():
+  while True:
+    await asyncio.sleep(config['ports']['snapshot_interval'])
+    try:
+      await asyncio.to_thread(Devices().save_snapshot)
+    except Exception as e:
+      log_print(f"💥 ports snapshot error: {e}")
 
 
 def devices_init(app, add_routes: bool = True):
   devices = Devices()
 
   if add_routes:
+    @app.on_event("startup")
+    async def start_ports_snapshot():
+      if config['ports']['snapshot_interval'] > 0:
+        asyncio.create_task(snapshot_ports_loop())
+
+    @app.on_event("shutdown")
+    def save_ports_snapshot():
+      Devices().save_snapshot()
+
     @app.get("/api/live/devices",
              tags=["live/devices"],
              response_model=dict,
@@ -293,6 +447,13 @@ def devices_init(app, add_routes: bool = True):
     def get_connections_list():
       return {name: item.get_info() for name, item in devices.devices.items()}
 
+    @app.get("/api/live/devices/load_stats",
+             tags=["live/devices"],
+             response_model=dict,
+             dependencies=[Depends(RoleChecker('admin'))])
+    def get_devices_load_stats():
+      return devices.load_stats or {}
+
     @app.post("/api/live/dag/{dag_id}/{port_name}/set",
               tags=["live/dags"],
               dependencies=[Depends(RoleChecker('admin'))])
@@ -331,10 +492,17 @@ def devices_init(app, add_routes: bool = True):
     @app.get("/api/live/ports",
              tags=["live/devices"],
              response_model=dict)
-    def get_ports_list():
-      data = {port_id: port.state() for port_id, port in devices.ports.items()}
-      data[0] = {'ts': datetime.now().timestamp()}
-      return {port_id: port for port_id, port in data.items() if port.get('ts') is not None}
+    def get_ports_list(since: int = None, epoch: str = None):
+      return devices.ports_state(since, epoch)
+
+    @app.get("/api/live/ports/{port_id}/history",
+             tags=["live/devices"],
+             response_model=dict)
+    def get_port_history(port_id: int, since: float = None, until: float = None, points: int = 300):
+      if port_id not in devices.ports:
+        raise HTTPException(status_code=404, detail="Port not found")
+      history = devices.ports[port_id].history or PortHistory()
+      return {'id': port_id, **history.query(since, until, points)}
 
 
 class PinsManager(SingletonClass):
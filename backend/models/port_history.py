@@ -0,0 +1,94 @@
+from array import array
+from bisect import bisect_left, bisect_right
+import threading
+
+from utils.configs import config
+
+
+class PortHistory:
+  """
+  Кольцевой буфер последних значений порта: метки времени и значения в array('d').
+  Массивы растут по мере поступления значений и ограничены capacity (16 байт на точку),
+  после заполнения запись идет по кругу.
+  Хранятся только значения, приводимые к float.
+  """
+  __slots__ = ('capacity', 'ts', 'values', 'head', 'count', '_lock')
+
+  def __init__(self, capacity: int = None):
+    self.capacity = capacity or config['ports'].get('history_size') or 0
+    self.ts: array = None
+    self.values: array = None
+    self.head = 0  # Индекс следующей записи
+    self.count = 0
+    self._lock = threading.Lock()
+
+  def add(self, ts: float, value):
+    if self.capacity <= 0 or value is None:
+      return
+    try:
+      value = float(value)
+    except (TypeError, ValueError):
+      return
+    with self._lock:
+      if self.ts is None:
+        self.ts = array('d')
+        self.values = array('d')
+      if self.count < self.capacity:
+        # Буфер еще не заполнен: head == count == len(ts), массивы растут
+        self.ts.append(ts)
+        self.values.append(value)
+        self.count += 1
+      else:
+        self.ts[self.head] = ts
+        self.values[self.head] = value
+      self.head = (self.head + 1) % self.capacity
+
+  def snapshot(self) -> (array, array):
+    """Копия буфера в хронологическом порядке"""
+    with self._lock:
+      if not self.count:
+        return array('d'), array('d')
+      if self.count < self.capacity:
+        return self.ts[:self.count], self.values[:self.count]
+      return self.ts[self.head:] + self.ts[:self.head], self.values[self.head:] + self.values[:self.head]
+
+  def query(self, since: float = None, until: float = None, points: int = 0) -> dict:
+    """
+    Значения за период [since, until]. Если точек больше points - прореживание по времени:
+    для каждого интервала min/max/avg и количество значений. Ответ по колонкам.
+    """
+    ts, values = self.snapshot()
+    start = bisect_left(ts, since) if since is not None else 0
+    end = bisect_right(ts, until) if until is not None else len(ts)
+    ts, values = ts[start:end], values[start:end]
+
+    if points <= 0 or len(ts) <= points:
+      return {'ts': ts.tolist(), 'min': values.tolist(), 'max': values.tolist(), 'avg': values.tolist(),
+              'count': [1] * len(ts)}
+
+    since = ts[0] if since is None else since
+    until = ts[-1] if until is None else until
+    step = (until - since) / points or 1
+    result = {'ts': [], 'min': [], 'max': [], 'avg': [], 'count': []}
+    bucket = None
+    for point_ts, value in zip(ts, values):
+      index = min(points - 1, int((point_ts - since) / step))
+      if index != bucket:
+        if bucket is not None:
+          result['avg'][-1] /= result['count'][-1]
+        bucket = index
+        result['ts'].append(since + index * step)
+        result['min'].append(value)
+        result['max'].append(value)
+        result['avg'].append(value)
+        result['count'].append(1)
+        continue
+      if value < result['min'][-1]:
+        result['min'][-1] = value
+      if value > result['max'][-1]:
+        result['max'][-1] = value
+      result['avg'][-1] += value
+      result['count'][-1] += 1
+    if bucket is not None:
+      result['avg'][-1] /= result['count'][-1]
+    return result
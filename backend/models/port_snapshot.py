@@ -0,0 +1,83 @@
+"""
+Снимок последних значений портов для теплого перезапуска.
+
+Формат файла (little-endian):
+  заголовок  HEADER: magic b'PSNP', версия, количество записей, время снимка
+  записи     RECORD фиксированного размера: port_id, ts, value, flags, смещение и длина блока
+  блоки      JSON [value, value_raw] для значений, которые не хранятся числом
+             (строки, словари, value != value_raw, int вне точного диапазона double)
+
+Записи фиксированного размера - файл можно открыть через mmap и читать запись по индексу
+без разбора всего файла. Запись атомарная: временный файл, fsync, os.replace.
+"""
+from math import nan
+from time import time
+import json
+import mmap
+import os
+import struct
+
+MAGIC = b'PSNP'
+VERSION = 1
+HEADER = struct.Struct('<4sHxxId')
+RECORD = struct.Struct('<qddBxxxII')
+
+FLAG_NUMERIC = 1  # value хранится в поле value, value_raw == value
+FLAG_INT = 2  # Число в поле value - int (double хранит его точно)
+MAX_EXACT_INT = 2 ** 53
+
+
+def _is_number(value) -> bool:
+  return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def save_snapshot(path: str, items: list):
+  """items: [(port_id, ts, value, value_raw)]"""
+  records = []
+  blobs = []
+  offset = 0
+  for port_id, ts, value, value_raw in items:
+    if _is_number(value) and value == value_raw and type(value) is type(value_raw):
+      if isinstance(value, float):
+        records.append(RECORD.pack(port_id, ts, value, FLAG_NUMERIC, 0, 0))
+        continue
+      if abs(value) <= MAX_EXACT_INT:
+        records.append(RECORD.pack(port_id, ts, value, FLAG_NUMERIC | FLAG_INT, 0, 0))
+        continue
+    blob = json.dumps([value, value_raw], default=str).encode()
+    records.append(RECORD.pack(port_id, ts, value if _is_number(value) else nan, 0, offset, len(blob)))
+    blobs.append(blob)
+    offset += len(blob)
+
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  tmp_path = f'{path}.tmp'
+  with open(tmp_path, 'wb') as file:
+    file.write(HEADER.pack(MAGIC, VERSION, len(records), time()))
+    file.write(b''.join(records))
+    file.write(b''.join(blobs))
+    file.flush()
+    os.fsync(file.fileno())
+  os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str):
+  """Итератор (port_id, ts, value, value_raw). Поврежденный или чужой файл - пустой результат"""
+  if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+    return
+  with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+    magic, version, count, _ = HEADER.unpack_from(data, 0)
+    blobs_start = HEADER.size + count * RECORD.size
+    if magic != MAGIC or version != VERSION or len(data) < blobs_start:
+      return
+    for index in range(count):
+      port_id, ts, value, flags, offset, size = RECORD.unpack_from(data, HEADER.size + index * RECORD.size)
+      if flags & FLAG_NUMERIC:
+        if flags & FLAG_INT:
+          value = int(value)
+        yield port_id, ts, value, value
+        continue
+      try:
+        value, value_raw = json.loads(data[blobs_start + offset:blobs_start + offset + size])
+      except ValueError:
+        continue
+      yield port_id, ts, value, value_raw
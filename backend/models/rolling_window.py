@@ -0,0 +1,156 @@
+from bisect import bisect_left, insort
+from collections import OrderedDict, deque
+from math import sqrt
+
+
+class RollingWindow:
+  """
+  Скользящее окно значений с ограничением по количеству и времени жизни.
+  Сумма и сумма квадратов обновляются при добавлении и вытеснении, min/max - монотонными очередями,
+  поэтому обновление - амортизированно O(1). Медиана и перцентили - по отсортированному списку (ordered=True).
+  keyed=True - одно значение на ключ (источник): новое значение ключа заменяет старое,
+  min/max в этом режиме берутся из отсортированного списка.
+  """
+  resync_every = 10000  # Пересчет сумм, чтобы не накапливалась ошибка округления
+  resync_ratio = 1e6  # Пересчет для stddev, если ошибка округления сумм может превысить 1/resync_ratio дисперсии
+
+  def __init__(self, max_count: int = 0, ttl: float = 0, ordered: bool = False, keyed: bool = False):
+    self.max_count = max_count
+    self.ttl = ttl
+    self.keyed = keyed
+    self.ordered = ordered or keyed
+    self.entries = OrderedDict()  # key -> (value, ts, seq), от старых к новым
+    self.sorted = []
+    self._max = deque()  # (value, seq), значения по убыванию
+    self._min = deque()  # (value, seq), значения по возрастанию
+    self._shift = None  # Суммы считаются от сдвига - меньше потеря точности для stddev
+    self._sum = 0.0
+    self._sum_sq = 0.0
+    self._peak_sq = 0.0  # Наибольший квадрат, прошедший через _sum_sq с последнего пересчета
+    self._seq = 0
+    self._pushes = 0
+
+  def __len__(self):
+    return len(self.entries)
+
+  def push(self, value: float, ts: float, key=None):
+    if self.keyed:
+      if key in self.entries:
+        self._discard(*self.entries.pop(key))
+    else:
+      key = self._seq
+    seq = self._seq
+    self._seq += 1
+    if self._shift is None:
+      self._shift = value
+    self.entries[key] = (value, ts, seq)
+    delta = value - self._shift
+    self._sum += delta
+    self._sum_sq += delta * delta
+    if delta * delta > self._peak_sq:
+      self._peak_sq = delta * delta
+    if self.ordered:
+      insort(self.sorted, value)
+    if not self.keyed:
+      while self._max and self._max[-1][0] <= value:
+        self._max.pop()
+      self._max.append((value, seq))
+      while self._min and self._min[-1][0] >= value:
+        self._min.pop()
+      self._min.append((value, seq))
+
+    if self.max_count > 0:
+      while len(self.entries) > self.max_count:
+        self._discard(*self.entries.popitem(last=False)[1])
+
+    self._pushes += 1
+    if self._pushes >= self.resync_every:
+      self._resync()
+
+  def expire(self, now: float):
+    """Вытесняет значения старше ttl"""
+    if self.ttl <= 0:
+      return
+    while self.entries:
+      value, ts, seq = next(iter(self.entries.values()))
+      if now - ts <= self.ttl:
+        break
+      self._discard(*self.entries.popitem(last=False)[1])
+
+  def _discard(self, value: float, ts: float, seq: int):
+    delta = value - self._shift
+    self._sum -= delta
+    self._sum_sq -= delta * delta
+    if self.ordered:
+      del self.sorted[bisect_left(self.sorted, value)]
+    if not self.keyed:
+      # Без ключей вытесняется всегда самое старое значение - оно может быть только в начале очередей
+      if self._max and self._max[0][1] == seq:
+        self._max.popleft()
+      if self._min and self._min[0][1] == seq:
+        self._min.popleft()
+    if not self.entries:
+      self._shift = None
+      self._sum = self._sum_sq = self._peak_sq = 0.0
+
+  def _resync(self):
+    self._pushes = 0
+    if not self.entries:
+      return
+    self._shift = self.mean
+    self._sum = sum(value - self._shift for value, _, _ in self.entries.values())
+    self._sum_sq = sum((value - self._shift) ** 2 for value, _, _ in self.entries.values())
+    self._peak_sq = max((value - self._shift) ** 2 for value, _, _ in self.entries.values())
+
+  @property
+  def sum(self) -> float:
+    return self._shift * len(self.entries) + self._sum if self.entries else 0.0
+
+  @property
+  def mean(self) -> float:
+    return self._shift + self._sum / len(self.entries)
+
+  @property
+  def min(self) -> float:
+    return self.sorted[0] if self.keyed else self._min[0][0]
+
+  @property
+  def max(self) -> float:
+    return self.sorted[-1] if self.keyed else self._max[0][0]
+
+  @property
+  def stddev(self) -> float:
+    """Стандартное отклонение (по генеральной совокупности)"""
+    count = len(self.entries)
+    mean = self._sum / count
+    variance = self._sum_sq / count - mean * mean
+    if max(mean * mean * count, self._peak_sq) > self.resync_ratio * max(variance * count, 0.0):
+      # Значения ушли далеко от сдвига или из окна вышли большие значения - разность сумм
+      # теряет точность, пересчитываем от среднего
+      self._resync()
+      mean = self._sum / count
+      variance = self._sum_sq / count - mean * mean
+    return sqrt(max(0.0, variance))
+
+  def percentile(self, p: float) -> float:
+    """Перцентиль с линейной интерполяцией, p в процентах"""
+    position = (len(self.sorted) - 1) * min(100.0, max(0.0, p)) / 100
+    index = int(position)
+    if index + 1 >= len(self.sorted):
+      return self.sorted[index]
+    return self.sorted[index] + (self.sorted[index + 1] - self.sorted[index]) * (position - index)
+
+  @property
+  def median(self) -> float:
+    return self.percentile(50)
+
+  @property
+  def rate(self) -> float:
+    """Скорость изменения в секунду между самым старым и самым новым значением окна"""
+    if len(self.entries) < 2:
+      return 0.0
+    first_value, first_ts, _ = next(iter(self.entries.values()))
+    last_value, last_ts, _ = next(reversed(self.entries.values()))
+    if last_ts == first_ts:
+      return 0.0
+    return (last_value - first_value) / (last_ts - first_ts)
@@ -1,15 +1,46 @@
 from traceback import print_tb
 
 from models.dag_node import DAGNode
+from models.dag_plan import ExecutionPlan
 from utils.socket_utils import connection_manager
 from models.system_dag import InputDag, ParamDag, OutputDag
 from typing import Union
+import asyncio
 
 
 class rootDag:
   path: list = None
   dags: dict = None
   root_name: str = None
+  plan: ExecutionPlan = None
+
+  def plan_edges(self):
+    """Связи графа: (узел, выход, тип входа, узел, вход)"""
+    for dag in (self.dags or {}).values():
+      for output_group, outputs in dag.outputs.items():
+        for input_type, output_node, input_group in outputs:
+          yield dag, output_group, input_type, output_node, input_group
+
+  def invalidate_plan(self):
+    """План пересобирается при следующем обращении"""
+    self.plan = None
+
+  def get_plan(self) -> ExecutionPlan:
+    plan = self.plan
+    if plan is None:
+      plan = self.plan = ExecutionPlan((self.dags or {}).values(), list(self.plan_edges()))
+    return plan
+
+  def rank_of(self, dag: DAGNode) -> tuple:
+    """Топологический ранг узла с учетом вложенности шаблонов (ранг шаблона, ранг внутри шаблона)"""
+    rank = self.get_plan().ranks.get(id(dag))
+    if rank is None:
+      return None
+    if not self.path:
+      return rank,
+    parent = getattr(self, 'root_dag', None)
+    parent_rank = parent.rank_of(self) if parent is not None else None
+    return None if parent_rank is None else (*parent_rank, rank)
 
   async def add_dag(self, dag: DAGNode) -> int:
     """Добавляет DAG для выполнения"""
@@ -17,6 +48,8 @@ class rootDag:
     if self.dags is None:
       self.dags = {}
     self.dags[dag_id] = dag
+    dag.root_dag = self
+    self.invalidate_plan()
     if self.path:
       print(f"{self.id}: {len(self.dags)}. Added DAG {dag.name} with id {dag_id}")
     else:
@@ -62,6 +95,7 @@ class rootDag:
         continue
       dag.setPage(dag_params.get('page', self.root_name or 'main'))
       dag.is_simple = dag_params.get('is_simple', False)
+      dag.source_id = dag_params['id']
       dag_id_map[dag_params['id']] = dag
 
     if self.path:
@@ -92,17 +126,34 @@ class rootDag:
             print(f"Error: DAG {dag_in} not found")
           else:
             await dag.add_output(dag_id_map[dag_in], in_type, group_out, group_in, send_update=False)
+    self.invalidate_plan()
+    self.get_plan()
+    # Параметры узлов устанавливаются задачами - состояние восстанавливается после них
+    asyncio.get_running_loop().call_soon(self.restore_states, list(dag_id_map.values()))
     return dag_id_map
 
+  def restore_states(self, dags: list):
+    """Восстанавливает сохраненное внутреннее состояние узлов"""
+    from orchestrator.checkpoint import dag_checkpointer
+    for dag in dags:
+      dag_checkpointer.restore(dag)
+
   def remove_dag(self, dag_id: int):
     """Удаляет DAG по идентификатору"""
     if self.dags is None:
       self.dags = {}
 
     if dag_id in self.dags:
-      for dag in self.dags.values():
-        dag.remove_output(self.dags[dag_id], all_groups=True, send_update=False)
+      # Удаляем только входящие связи узла - по обратному индексу плана
+      dag = self.dags[dag_id]
+      for src, group_out, in_type, group_in in self.get_plan().incoming_edges(dag):
+        src.remove_output(dag, group_out, group_in, in_type, send_update=False)
+      # Сам узел останавливается: таймеры и задачи в очереди не должны доходить до оставшихся узлов
+      dag.kill()
+      dag.outputs = {}
+      dag.root_dag = None
       del self.dags[dag_id]
+      self.invalidate_plan()
       return True
     return False
 
@@ -123,6 +174,7 @@ class rootDag:
       print('add_dag_connections start')
       dag = self.dags[dag_out]
       await dag.add_output(self.dags[dag_in], in_type, group_out, group_in)
+      self.invalidate_plan()
       return True
     return
 
@@ -136,5 +188,6 @@ class rootDag:
     if dag_out in self.dags and dag_in in self.dags:
       dag = self.dags[dag_out]
       dag.remove_output(self.dags[dag_in], group_out, group_in, to_type)
+      self.invalidate_plan()
       return True
     return False
@@ -40,6 +40,10 @@ class OutputDag(DAGNode):
   def set_root_tpl(self, root_tpl: "DAGTemplateBase"):
     self.root_tpl = root_tpl
 
+  def next_nodes(self):
+    if self.root_tpl is not None:
+      yield from DAGNode.next_nodes(self.root_tpl)
+
   def process(self, input_keys: List[str]):
     self.root_tpl.updated_output = {self.name: self.input_values.get(key, None) for key in input_keys}
     print('🔗 tpl output', self.name, id(self), id(self.root_tpl), self.updated_output, self.input_values)
@@ -0,0 +1,141 @@
+from time import time, monotonic
+import json
+import os
+import threading
+
+from utils.configs import config
+from utils.logs import log_print
+
+
+def has_state(dag) -> bool:
+  """Узел переопределяет get_state - его состояние сохраняется"""
+  from models.dag_node import DAGNode
+  return type(dag).get_state is not DAGNode.get_state
+
+
+class DagCheckpointer:
+  """
+  Сохранение внутреннего состояния узлов между перезапусками (store/dag_state.jsonl).
+  Каждая запись - одна строка JSON с состояниями только тех узлов, которые выполнялись с прошлой записи.
+  Когда строк становится много, файл переписывается целиком (атомарно) одним снимком.
+  Узлы адресуются путем checkpoint_path: id из orchestrator.json, для узлов шаблонов - через id шаблона.
+  """
+  compact_lines = 100
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.states: dict = None  # path -> state, содержимое файла
+    self.versions = {}  # id(node) -> state_version на момент записи
+    self.lines = 0
+    self.written = 0
+    self.last_checkpoint = None
+    self.last_checkpoint_ms = 0.0
+
+  @property
+  def path(self) -> str:
+    return os.path.abspath(config['dags']['checkpoint_path'])
+
+  def get_states(self) -> dict:
+    if self.states is None:
+      self.states = {}
+      self.lines = 0
+      if os.path.exists(self.path):
+        with open(self.path, 'r', encoding='utf-8') as f:
+          for line in f:
+            try:
+              self.states.update(json.loads(line)['states'])
+              self.lines += 1
+            except (ValueError, KeyError, TypeError):
+              continue  # Недописанная строка при аварийной остановке
+    return self.states
+
+  def restore(self, dag):
+    """Восстанавливает состояние узла из последней записи"""
+    if not has_state(dag):
+      return
+    state = self.get_states().get(dag.checkpoint_path())
+    if state is None:
+      return
+    try:
+      with dag._lock:
+        dag.set_state(state)
+    except Exception as e:
+      log_print(f"💥 {dag} restore state error: {e}")
+
+  @staticmethod
+  def iter_nodes(root):
+    """Все узлы дерева, включая узлы внутри шаблонов"""
+    for dag in list((root.dags or {}).values()):
+      yield dag
+      if getattr(dag, 'path', None) and getattr(dag, 'dags', None):
+        yield from DagCheckpointer.iter_nodes(dag)
+
+  def checkpoint(self, full: bool = False, root=None) -> int:
+    """
+    Записывает состояние изменившихся узлов. full - переписать файл снимком всех узлов.
+    root - корневой граф (по умолчанию Orchestrator)
+    """
+    if root is None:
+      from orchestrator.orchestrator import Orchestrator
+      root = Orchestrator()
+    with self._lock:
+      start = monotonic()
+      states = self.get_states()
+      full = full or self.lines >= self.compact_lines
+      changed = {}
+      versions = {}
+      for dag in self.iter_nodes(root):
+        if not has_state(dag):
+          continue
+        version = dag.state_version
+        versions[id(dag)] = version
+        if not full and self.versions.get(id(dag)) == version:
+          continue
+        try:
+          with dag._lock:
+            changed[dag.checkpoint_path()] = dag.get_state()
+        except Exception as e:
+          log_print(f"💥 {dag} get state error: {e}")
+
+      if full:
+        self._write_all(changed)
+      elif changed:
+        self._append(changed)
+        states.update(changed)
+      self.versions = versions
+      self.written += len(changed)
+      self.last_checkpoint = time()
+      self.last_checkpoint_ms = round((monotonic() - start) * 1000, 3)
+      return len(changed)
+
+  def _append(self, changed: dict):
+    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+    with open(self.path, 'a', encoding='utf-8') as f:
+      f.write(json.dumps({'ts': time(), 'states': changed}, default=str) + '\n')
+      f.flush()
+      os.fsync(f.fileno())
+    self.lines += 1
+
+  def _write_all(self, states: dict):
+    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+    tmp_path = f'{self.path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+      f.write(json.dumps({'ts': time(), 'states': states}, default=str) + '\n')
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(tmp_path, self.path)
+    self.states = dict(states)
+    self.lines = 1
+
+  def stats(self) -> dict:
+    return {
+      'path': self.path,
+      'states': len(self.states or {}),
+      'lines': self.lines,
+      'written': self.written,
+      'last_checkpoint': self.last_checkpoint,
+      'last_checkpoint_ms': self.last_checkpoint_ms,
+    }
+
+
+dag_checkpointer = DagCheckpointer()
@@ -0,0 +1,114 @@
+from collections import deque
+from typing import Callable
+import concurrent.futures
+import threading
+import os
+
+from utils.configs import config
+from utils.logs import log_print
+
+
+class DagExecutor:
+  """
+  Общий пул потоков для выполнения узлов DAG.
+  У каждого узла своя очередь (mailbox): задачи одного узла выполняются строго по порядку,
+  разные узлы выполняются параллельно.
+  """
+  batch_size = 32  # Сколько задач узла выполнить подряд, прежде чем отдать поток другим узлам
+
+  def __init__(self, max_workers: int = None):
+    self.max_workers = max_workers or config['dags'].get('max_workers') or (os.cpu_count() or 1) + 2
+    self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='dag')
+    self._lock = threading.Lock()
+    self._mailboxes = {}  # id(node) -> deque[(func, args)]
+    self._active = set()  # id(node), для которых уже запущен обработчик очереди
+    self.running = 0  # Потоки пула, которые сейчас выполняют задачи узлов
+    self.peak_running = 0
+    self.submitted = 0
+    self.completed = 0
+    self.errors = 0
+    self.cancelled = 0
+    self.peak_depth = 0
+
+  def submit(self, node, func: Callable, *args):
+    """Ставит задачу в очередь узла"""
+    key = id(node)
+    with self._lock:
+      mailbox = self._mailboxes.get(key)
+      if mailbox is None:
+        mailbox = self._mailboxes[key] = deque()
+      mailbox.append((func, args))
+      self.submitted += 1
+      if len(mailbox) > self.peak_depth:
+        self.peak_depth = len(mailbox)
+      if key in self._active:
+        return
+      self._active.add(key)
+    self._pool.submit(self._drain, key)
+
+  def cancel(self, node) -> int:
+    """Удаляет из очереди узла задачи, которые еще не начали выполняться"""
+    with self._lock:
+      mailbox = self._mailboxes.get(id(node))
+      if not mailbox:
+        return 0
+      count = len(mailbox)
+      mailbox.clear()
+      self.cancelled += count
+    return count
+
+  def depth(self, node) -> int:
+    mailbox = self._mailboxes.get(id(node))
+    return len(mailbox) if mailbox else 0
+
+  def _drain(self, key: int):
+    with self._lock:
+      self.running += 1
+      if self.running > self.peak_running:
+        self.peak_running = self.running
+    try:
+      self._drain_mailbox(key)
+    finally:
+      with self._lock:
+        self.running -= 1
+
+  def _drain_mailbox(self, key: int):
+    for _ in range(self.batch_size):
+      with self._lock:
+        mailbox = self._mailboxes.get(key)
+        if not mailbox:
+          self._mailboxes.pop(key, None)
+          self._active.discard(key)
+          return
+        func, args = mailbox.popleft()
+      try:
+        func(*args)
+      except Exception as e:
+        with self._lock:
+          self.errors += 1
+        log_print(f"💥 executor error in {func}: {e}")
+      with self._lock:
+        self.completed += 1
+
+    # Очередь узла не пуста - перезапускаемся в конце пула, чтобы не блокировать другие узлы
+    self._pool.submit(self._drain, key)
+
+  def stats(self) -> dict:
+    with self._lock:
+      depths = [len(mailbox) for mailbox in self._mailboxes.values()]
+    return {
+      'max_workers': self.max_workers,
+      'running': self.running,
+      'peak_running': self.peak_running,
+      'active_nodes': len(self._active),
+      'queued': sum(depths),
+      'max_depth': max(depths, default=0),
+      'peak_depth': self.peak_depth,
+      'submitted': self.submitted,
+      'completed': self.completed,
+      'cancelled': self.cancelled,
+      'errors': self.errors,
+    }
+
+
+dag_executor = DagExecutor()
@@ -0,0 +1,80 @@
+from bisect import bisect_left
+from time import time
+
+
+class Histogram:
+  """Гистограмма задержек в миллисекундах с фиксированными корзинами"""
+  bounds = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+  def __init__(self):
+    self.buckets = [0] * (len(self.bounds) + 1)
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+
+  def add(self, value_ms: float):
+    self.buckets[bisect_left(self.bounds, value_ms)] += 1
+    self.count += 1
+    self.total += value_ms
+    if value_ms > self.max:
+      self.max = value_ms
+
+  def percentile(self, p: float) -> float:
+    """Оценка перцентиля по верхней границе корзины"""
+    if not self.count:
+      return 0.0
+    need = self.count * p / 100
+    seen = 0
+    for index, count in enumerate(self.buckets):
+      seen += count
+      if seen >= need:
+        return min(self.bounds[index], round(self.max, 3)) if index < len(self.bounds) else round(self.max, 3)
+    return round(self.max, 3)
+
+  def get_json(self, with_buckets: bool = True) -> dict:
+    data = {
+      'count': self.count,
+      'avg': round(self.total / self.count, 3) if self.count else 0.0,
+      'p50': self.percentile(50),
+      'p99': self.percentile(99),
+      'max': round(self.max, 3),
+    }
+    if with_buckets:
+      data['buckets'] = dict(zip([*map(str, self.bounds), 'inf'], self.buckets))
+    return data
+
+
+class NodeMetrics:
+  """Метрики выполнения одного узла"""
+
+  def __init__(self):
+    self.invocations = 0
+    self.errors = 0
+    self.last_run: float = None
+    self.last_error: str = None
+    self.busy_ms = 0.0  # Суммарное время execute
+    self.execute = Histogram()
+    self.run_next = Histogram()
+
+  def add_execute(self, duration_ms: float, error: Exception = None):
+    self.invocations += 1
+    self.last_run = time()
+    self.busy_ms += duration_ms
+    self.execute.add(duration_ms)
+    if error is not None:
+      self.errors += 1
+      self.last_error = str(error)
+
+  def add_run_next(self, duration_ms: float):
+    self.run_next.add(duration_ms)
+
+  def get_json(self, with_buckets: bool = True) -> dict:
+    return {
+      'invocations': self.invocations,
+      'errors': self.errors,
+      'last_run': self.last_run,
+      'last_error': self.last_error,
+      'busy_ms': round(self.busy_ms, 3),
+      'execute': self.execute.get_json(with_buckets),
+      'run_next': self.run_next.get_json(with_buckets),
+    }
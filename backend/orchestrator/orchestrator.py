@@ -7,6 +7,7 @@ from models.root_dag import rootDag
 from utils.socket_utils import connection_manager
 from pydantic import BaseModel, Field
 from utils.auth import RoleChecker
+from utils.configs import config
 import json
 import os
 import asyncio
@@ -55,16 +56,100 @@ class Orchestrator(SingletonClass, rootDag):
       log_print("No DAGs found in file, creating empty DAGs")
 
 
+def collect_metrics(with_buckets: bool = False) -> dict:
+  """Метрики всех узлов оркестратора и активных шаблонов"""
+  from orchestrator.template_manager import TemplateManager
+  data = {}
+  for root_dag in [Orchestrator(), *TemplateManager.templates.values()]:
+    for dag_id, dag in (root_dag.dags or {}).items():
+      data[str(dag_id)] = dag.get_stats(with_buckets)
+  return data
+
+
+@router.on_event("startup")
+async def start_metrics_stream():
+  async def stream_metrics(interval: float):
+    while True:
+      await asyncio.sleep(interval)
+      try:
+        await connection_manager.broadcast({"type": "dag", "action": "metrics", "data": collect_metrics()})
+      except Exception as e:
+        log_print(f"Error sending DAG metrics: {e}")
+
+  interval = config['dags'].get('metrics_interval') or 0
+  if interval > 0:
+    asyncio.create_task(stream_metrics(interval))
+
+
+@router.on_event("startup")
+async def start_checkpointer():
+  from orchestrator.checkpoint import dag_checkpointer
+
+  async def checkpoint_loop(interval: float):
+    while True:
+      await asyncio.sleep(interval)
+      try:
+        await asyncio.to_thread(dag_checkpointer.checkpoint)
+      except Exception as e:
+        log_print(f"Error saving DAG state: {e}")
+
+  interval = config['dags'].get('checkpoint_interval') or 0
+  if interval > 0:
+    asyncio.create_task(checkpoint_loop(interval))
+
+
+@router.on_event("shutdown")
+def save_checkpoint():
+  from orchestrator.checkpoint import dag_checkpointer
+  dag_checkpointer.checkpoint()
+
+
 @router.get("/orchestrator/save", tags=["dags"], dependencies=[Depends(RoleChecker('admin'))])
 async def save_dags():
   """
   Save all DAGs to file
   """
+  from orchestrator.checkpoint import dag_checkpointer
   with open('../store/orchestrator.json', 'w') as f:
     f.write(json.dumps(Orchestrator().list_dags(is_clean=True, load_all=True)))
+  # В файле теперь текущие id узлов - состояние переписывается под новые адреса
+  for dag in (Orchestrator().dags or {}).values():
+    dag.source_id = dag.id
+  await asyncio.to_thread(dag_checkpointer.checkpoint, True)
   return {'status_code': 200}
 
 
+@router.get("/orchestrator/executor", tags=["dags"], dependencies=[Depends(RoleChecker('admin'))])
+async def get_executor_stats():
+  """
+  Get shared DAG executor stats: pool size, mailbox depth, wave propagation and timer counters
+  """
+  from orchestrator.executor import dag_executor
+  from orchestrator.propagation import propagation_stats
+  from orchestrator.timers import timer_service
+  from orchestrator.process_pool import dag_process_pool
+  from orchestrator.checkpoint import dag_checkpointer
+  return {**dag_executor.stats(),
+          'propagation': propagation_stats.get_json(),
+          'timers': timer_service.stats(),
+          'process_pool': dag_process_pool.stats(),
+          'checkpoint': dag_checkpointer.stats()}
+
+
+@router.get("/orchestrator/plan", tags=["dags"], dependencies=[Depends(RoleChecker('admin'))])
+async def get_plan(tpl_id: str = None):
+  """
+  Get compiled execution plan: topological order and detected cycles
+  """
+  root_dag = Orchestrator()
+  if tpl_id is not None:
+    from orchestrator.template_manager import TemplateManager
+    root_dag = TemplateManager.templates.get(tpl_id)
+    if root_dag is None:
+      return {"error": f"Template {tpl_id} not found"}, 422
+  return root_dag.get_plan().get_json()
+
+
 @router.get("/orchestrator", tags=["dags"], dependencies=[Depends(RoleChecker('admin'))])
 async def get_json():
   """
@@ -116,6 +201,34 @@ async def add_dag(dag_item: postDag, tpl_id: str = None):
   return dag.get_json()
 
 
+@router.get("/dags/metrics", tags=["dags"], dependencies=[Depends(RoleChecker('admin'))])
+async def get_dags_metrics(with_buckets: bool = False):
+  """
+  Get execution metrics of all DAG nodes: invocations, errors, execute and run_next latency
+  """
+  return collect_metrics(with_buckets)
+
+
+@router.get("/dags/{dag_id}/stats", tags=["dags"], dependencies=[Depends(RoleChecker('admin'))])
+@router.get("/templates/{tpl_id}/{dag_id}/stats", tags=["dags_templates"],
+            dependencies=[Depends(RoleChecker('admin'))])
+async def get_dag_stats(dag_id: Union[int, str], tpl_id: str = None):
+  """
+  Get DAG execution stats
+  """
+  if isinstance(dag_id, str) and dag_id.isdigit():
+    dag_id = int(dag_id)
+  dags = Orchestrator().dags
+  if tpl_id:
+    from orchestrator.template_manager import TemplateManager
+    if tpl_id not in TemplateManager.templates:
+      return {"error": f"Template {tpl_id} not found"}, 422
+    dags = TemplateManager.templates[tpl_id].dags
+  if dag_id not in dags:
+    return {"error": f"DAG {dag_id} not found"}, 422
+  return dags[dag_id].get_stats()
+
+
 @router.put("/dags/{dag_id}", tags=["dags"], dependencies=[Depends(RoleChecker('admin'))])
 async def update_dag(dag_id: Union[int, str], dag_item: putDag):
   """
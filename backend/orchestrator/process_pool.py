@@ -0,0 +1,134 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+import importlib
+import multiprocessing
+import threading
+
+from utils.configs import config
+from utils.logs import log_print, log_writer
+from utils.socket_utils import connection_manager
+
+
+@contextmanager
+def _capture_logs(dag, records: list):
+  """
+  В дочернем процессе нет ни файла логов сервера, ни веб-сокетов: строки log_print и вызовы
+  broadcast_log копятся в records и повторяются в родительском процессе
+  """
+
+  def add(item: tuple):
+    records.append(('log', item))
+
+  def broadcast_log(*args, **kwargs):
+    own = kwargs.get('dag') is dag
+    if own:
+      kwargs.pop('dag')
+    records.append(('broadcast', own, args, kwargs))
+
+  log_writer.add = add
+  connection_manager.broadcast_log = broadcast_log
+  try:
+    yield
+  finally:
+    del log_writer.add
+    del connection_manager.broadcast_log
+
+
+def _execute_in_process(module_name: str, class_name: str, input_keys: list, input_values: dict, params: dict,
+                        state: dict):
+  """Выполняется в дочернем процессе: execute на копии узла без конструктора"""
+  dag_class = getattr(importlib.import_module(module_name), class_name)
+  dag = dag_class.__new__(dag_class)
+  dag.outputs = {}
+  dag.input_values = input_values
+  dag.params = params
+  dag.updated_output = {}
+  for key, value in state.items():
+    setattr(dag, key, value)
+  records = []
+  with _capture_logs(dag, records):
+    dag.execute(input_keys)
+  return id(dag), dag.updated_output, dag.params, {key: getattr(dag, key, None) for key in state}, records
+
+
+class DagProcessPool:
+  """
+  Пул процессов для тяжелых узлов (DAGNode.run_in_process = True).
+  В процесс передаются входы, параметры и атрибуты из DAGNode.process_state,
+  обратно возвращаются updated_output, параметры, новое состояние и логи дочернего процесса.
+  """
+
+  def __init__(self):
+    self._pool: ProcessPoolExecutor = None
+    self._lock = threading.Lock()
+    self.max_workers = None
+    self.executed = 0
+    self.errors = 0
+
+  def _get_pool(self) -> ProcessPoolExecutor:
+    with self._lock:
+      if self._pool is None:
+        self.max_workers = config['dags'].get('process_workers') or 2
+        # spawn: дочерний процесс не наследует потоки MQTT/uvicorn родителя
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                         mp_context=multiprocessing.get_context('spawn'))
+      return self._pool
+
+  def execute(self, dag, input_keys: list) -> dict:
+    """Выполняет execute узла в пуле процессов и возвращает updated_output"""
+    state = {key: getattr(dag, key, None) for key in dag.process_state}
+    try:
+      child_id, updated_output, params, state, records = self._get_pool().submit(
+        _execute_in_process, dag.__class__.__module__, dag.__class__.__name__,
+        list(input_keys), dag.input_values, dag.params, state).result()
+    except BrokenProcessPool:
+      with self._lock:
+        self._pool = None
+      self.errors += 1
+      raise
+    except Exception:
+      self.errors += 1
+      raise
+    self.executed += 1
+    dag.params.update(params)
+    for key, value in state.items():
+      setattr(dag, key, value)
+    self._replay(dag, child_id, records)
+
+    # set_output в процессе добавил в цепочку key id копии узла - заменяем на id узла
+    for value in updated_output.values():
+      if value['key'] and value['key'][-1] == child_id:
+        value['key'] = (*value['key'][:-1], id(dag))
+    return updated_output
+
+  @staticmethod
+  def _replay(dag, child_id: int, records: list):
+    """Логи дочернего процесса - в файл логов и веб-сокеты сервера, от имени исходного узла"""
+    for record in records:
+      if record[0] == 'log':
+        log_writer.add(record[1])
+        continue
+      _, own, args, kwargs = record
+      if own or kwargs.get('dag_id') == child_id:
+        kwargs['dag'] = dag
+        kwargs.pop('dag_id', None)
+      connection_manager.broadcast_log(*args, **kwargs)
+
+  def stats(self) -> dict:
+    return {
+      'max_workers': self.max_workers,
+      'started': self._pool is not None,
+      'executed': self.executed,
+      'errors': self.errors,
+    }
+
+  def shutdown(self):
+    with self._lock:
+      if self._pool is not None:
+        log_print('Process pool shutdown')
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+
+
+dag_process_pool = DagProcessPool()
@@ -0,0 +1,168 @@
+from collections import deque
+from contextlib import contextmanager
+from heapq import heappush, heappop
+import threading
+
+from utils.configs import config
+from utils.logs import log_print
+
+_local = threading.local()
+
+
+class PropagationStats:
+  """Счетчики волнового распространения"""
+
+  def __init__(self):
+    self.waves = 0
+    self.executed = 0
+    self.merged = 0  # Сколько запусков узлов сэкономлено за счет объединения входов
+    self.aborted = 0
+
+  def get_json(self) -> dict:
+    return {
+      'mode': propagation_mode(),
+      'waves': self.waves,
+      'executed': self.executed,
+      'saved': self.merged,
+      'aborted': self.aborted,
+    }
+
+
+propagation_stats = PropagationStats()
+
+
+def propagation_mode() -> str:
+  """depth - сразу запускать следующий узел (по умолчанию), wave - топологическими волнами"""
+  return config['dags'].get('propagation') or 'depth'
+
+
+def current_wave() -> "Wave":
+  return getattr(_local, 'wave', None)
+
+
+def topological_ranks(seeds: list) -> dict:
+  """
+  Ранги узлов, достижимых из seeds, в топологическом порядке (алгоритм Кана).
+  Узлы в циклах получают ранги после всех остальных в порядке обхода.
+  """
+  nodes = {}
+  edges = {}
+  queue = deque(seeds)
+  while queue:
+    node = queue.popleft()
+    if id(node) in nodes:
+      continue
+    nodes[id(node)] = node
+    edges[id(node)] = [id(next_node) for next_node in node.next_nodes()]
+    for next_node in node.next_nodes():
+      if id(next_node) not in nodes:
+        queue.append(next_node)
+
+  indegree = {key: 0 for key in nodes}
+  for key, next_keys in edges.items():
+    for next_key in next_keys:
+      indegree[next_key] += 1
+
+  ranks = {}
+  queue = deque(key for key, count in indegree.items() if count == 0)
+  while queue:
+    key = queue.popleft()
+    ranks[key] = len(ranks)
+    for next_key in edges[key]:
+      indegree[next_key] -= 1
+      if indegree[next_key] == 0:
+        queue.append(next_key)
+
+  for key in nodes:  # Циклы
+    if key not in ranks:
+      ranks[key] = len(ranks)
+  return ranks
+
+
+class Wave:
+  """
+  Одна волна распространения события по графу.
+  Каждый узел выполняется один раз за волну со всеми обновленными входами,
+  узлы выполняются в топологическом порядке.
+  """
+  max_steps = 10000  # Защита от бесконечных циклов в графе
+
+  def __init__(self):
+    self.pending = {}  # id(node) -> (node, set(input_keys))
+    self.params = {}  # id(node) -> (node, {name: value}) - измененные параметры для отправки в конце волны
+    self.ranks = {}  # id(node) -> tuple
+    self._heap = []
+    self._seq = 0
+    self._rank = ()
+    self._running = False
+    self.executed = 0
+
+  @contextmanager
+  def collect(self):
+    """Вызовы process() внутри блока добавляют узлы в волну вместо запуска"""
+    prev = current_wave()
+    _local.wave = self
+    try:
+      yield self
+    finally:
+      _local.wave = prev
+
+  def add(self, node, input_keys):
+    key = id(node)
+    if key in self.pending:
+      self.pending[key][1].update(input_keys)
+      propagation_stats.merged += 1
+      return
+    self.pending[key] = (node, set(input_keys))
+    if self._running:
+      heappush(self._heap, (self.rank(node), self._seq, key))
+    self._seq += 1
+
+  def add_params(self, node, params: dict):
+    if not params:
+      return
+    if id(node) not in self.params:
+      self.params[id(node)] = (node, {})
+    self.params[id(node)][1].update(params)
+
+  def rank(self, node) -> tuple:
+    key = id(node)
+    if key not in self.ranks:
+      rank = node.root_dag.rank_of(node) if node.root_dag is not None else None
+      # Узел вне скомпилированного плана - сразу после текущего
+      self.ranks[key] = rank if rank is not None else (*self._rank, 0)
+    return self.ranks[key]
+
+  def run(self):
+    seeds = [node for node, _ in self.pending.values()]
+    if any(node.root_dag is None for node in seeds):
+      # Узлы вне оркестратора: ранги по достижимому подграфу
+      self.ranks = {key: (rank,) for key, rank in topological_ranks(seeds).items()}
+    self._heap = []
+    for seq, (key, (node, _)) in enumerate(self.pending.items()):
+      heappush(self._heap, (self.rank(node), seq, key))
+
+    propagation_stats.waves += 1
+    self._running = True
+    with self.collect():
+      while self._heap:
+        if self.executed >= self.max_steps:
+          propagation_stats.aborted += 1
+          log_print(f"💥 wave aborted after {self.executed} steps, pending {len(self.pending)}")
+          break
+        self._rank, _, key = heappop(self._heap)
+        if key not in self.pending:
+          continue
+        node, input_keys = self.pending.pop(key)
+        try:
+          node._process(list(input_keys))
+        except Exception as e:
+          log_print(f"💥 wave error running {node}: {e}")
+        self.executed += 1
+        propagation_stats.executed += 1
+
+    for node, params in self.params.values():
+      try:
+        node.send_params_threadsafe(params)
+      except Exception as e:
+        log_print(f"💥 wave error sending params {node}: {e}")
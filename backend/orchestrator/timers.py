@@ -0,0 +1,107 @@
+from heapq import heappush, heappop, heapify
+from time import monotonic
+from typing import Callable
+import threading
+
+from utils.logs import log_print
+
+
+class Timer:
+  """Взведенный таймер. Отмена - O(1), запись удаляется из кучи при срабатывании"""
+  __slots__ = ('service', 'deadline', 'callback', 'args', 'active')
+
+  def __init__(self, service: "TimerService", deadline: float, callback: Callable, args: tuple):
+    self.service = service
+    self.deadline = deadline
+    self.callback = callback
+    self.args = args
+    self.active = True
+
+  def cancel(self):
+    self.service.cancel(self)
+
+  @property
+  def remaining(self) -> float:
+    return max(0.0, self.deadline - monotonic())
+
+
+class TimerService:
+  """
+  Общий сервис таймеров на куче: один поток на все таймеры.
+  Взвод - O(log n), отмена - O(1).
+  Колбэк вызывается в потоке сервиса и должен быть коротким (например, dag_executor.submit).
+  """
+
+  def __init__(self):
+    self._heap = []
+    self._seq = 0
+    self._cond = threading.Condition()
+    self._thread = None
+    self.fired = 0
+    self.cancelled = 0
+    self.armed = 0
+
+  def arm(self, delay: float, callback: Callable, *args) -> Timer:
+    """Взводит таймер на delay секунд"""
+    timer = Timer(self, monotonic() + max(0.0, delay), callback, args)
+    with self._cond:
+      heappush(self._heap, (timer.deadline, self._seq, timer))
+      self._seq += 1
+      self.armed += 1
+      if len(self._heap) > 2 * (self.armed - self.fired - self.cancelled) + 64:
+        # Отмененные таймеры накапливаются при частом перевзводе - чистим кучу
+        self._heap = [item for item in self._heap if item[2].active]
+        heapify(self._heap)
+      if self._thread is None:
+        self._thread = threading.Thread(target=self._run, name='dag-timers', daemon=True)
+        self._thread.start()
+      elif self._heap[0][2] is timer:
+        self._cond.notify()
+    return timer
+
+  def cancel(self, timer: Timer):
+    # Под блокировкой: срабатывание и отмена не пересекаются, счетчики сходятся
+    with self._cond:
+      if timer.active:
+        timer.active = False
+        self.cancelled += 1
+
+  def _next(self) -> Timer:
+    with self._cond:
+      while True:
+        if not self._heap:
+          self._cond.wait()
+          continue
+        deadline, _, timer = self._heap[0]
+        if not timer.active:
+          heappop(self._heap)
+          continue
+        wait = deadline - monotonic()
+        if wait <= 0:
+          heappop(self._heap)
+          timer.active = False
+          self.fired += 1
+          return timer
+        self._cond.wait(wait)
+
+  def _run(self):
+    while True:
+      timer = self._next()  # Уже помечен сработавшим: отмена после этого ничего не меняет
+      try:
+        timer.callback(*timer.args)
+      except Exception as e:
+        log_print(f"💥 timer error in {timer.callback}: {e}")
+
+  def stats(self) -> dict:
+    with self._cond:
+      size = len(self._heap)
+    return {
+      'active': self.armed - self.fired - self.cancelled,
+      'heap_size': size,
+      'armed': self.armed,
+      'fired': self.fired,
+      'cancelled': self.cancelled,
+    }
+
+
+timer_service = TimerService()
@@ -0,0 +1,72 @@
+from time import time
+from types import SimpleNamespace
+import json
+
+import pytest
+
+from dags.agg import AggNode
+from orchestrator.checkpoint import DagCheckpointer
+from utils.configs import config
+
+
+@pytest.fixture
+def path(monkeypatch, tmp_path):
+  path = tmp_path / 'dag_state.jsonl'
+  monkeypatch.setitem(config['dags'], 'checkpoint_path', str(path))
+  return path
+
+
+def agg_node(source_id: str, values: list, channel: int = 0) -> AggNode:
+  node = AggNode()
+  node.source_id = source_id
+  node.params['channel'] = channel
+  window = node.get_window()
+  for index, value in enumerate(values):
+    window.push(value, time(), (1, index) if channel else None)
+  node.state_version += 1
+  return node
+
+
+def root_of(*nodes) -> SimpleNamespace:
+  return SimpleNamespace(dags={id(node): node for node in nodes})
+
+
+def test_incremental_checkpoint_and_compaction(path):
+  node = agg_node('a', [1, 2, 3])
+  other = agg_node('b', [10])
+  root = root_of(node, other)
+  checkpointer = DagCheckpointer()
+
+  assert checkpointer.checkpoint(root=root) == 2
+  assert checkpointer.checkpoint(root=root) == 0  # Ничего не изменилось
+  node.get_window().push(4, time())
+  node.state_version += 1
+  assert checkpointer.checkpoint(root=root) == 1
+  assert len(path.read_text().splitlines()) == 2
+
+  checkpointer.compact_lines = 2
+  assert checkpointer.checkpoint(root=root) == 2  # Перезапись одним снимком
+  lines = path.read_text().splitlines()
+  assert len(lines) == 1
+  assert set(json.loads(lines[0])['states']) == {'a', 'b'}
+
+
+def test_restore_after_restart(path):
+  DagCheckpointer().checkpoint(root=root_of(agg_node('a', [1, 2, 3])))
+  with open(path, 'a', encoding='utf-8') as f:
+    f.write('{"ts": 1, "states": {"a"')  # Недописанная строка при аварийной остановке
+
+  restored = AggNode()
+  restored.source_id = 'a'
+  DagCheckpointer().restore(restored)
+  assert restored.window.mean == 2
+  assert len(restored.window) == 3
+
+
+def test_keyed_window_is_not_restored(path):
+  DagCheckpointer().checkpoint(root=root_of(agg_node('k', [1, 2], channel=1)))
+  restored = AggNode()
+  restored.source_id = 'k'
+  restored.params['channel'] = 1
+  DagCheckpointer().restore(restored)
+  assert restored.window is None or len(restored.window) == 0
@@ -0,0 +1,60 @@
+import threading
+
+from models.dag_node import DAGNode
+from orchestrator.executor import dag_executor
+from utils.configs import config
+
+
+class RecordNode(DAGNode):
+  name = 'record'
+  input_groups = [{'name': 'default'}, {'name': 'other'}]
+
+  def __init__(self):
+    super().__init__()
+    self.runs = []
+
+  def execute(self, input_keys: list):
+    self.runs.append({key: self.input_values[key]['new_value'][0] for key in input_keys})
+
+
+def send(node: DAGNode, value, port: str = 'default'):
+  node.set_input({'key': ['test'], 'new_value': (value, 1700000000.0)}, port)
+  node.process([port])
+
+
+def wait_idle(node: DAGNode):
+  idle = threading.Event()
+  dag_executor.submit(node, idle.set)
+  assert idle.wait(2)
+
+
+def test_burst_into_busy_node_runs_once_with_newest_value(monkeypatch):
+  monkeypatch.setitem(config['dags'], 'propagation', 'depth')
+  node = RecordNode()
+  node.params['coalesce'] = 'default'
+  gate = threading.Event()
+  dag_executor.submit(node, gate.wait, 2)  # Узел занят
+
+  for value in range(1, 6):
+    send(node, value)
+  send(node, 'x', 'other')  # Вход без coalesce обрабатывается каждый раз
+  gate.set()
+  wait_idle(node)
+
+  assert node.runs == [{'default': 5}, {'other': 'x'}]
+  assert node.coalesced == 4
+  assert node.dropped == 4
+
+
+def test_without_coalesce_every_value_runs(monkeypatch):
+  monkeypatch.setitem(config['dags'], 'propagation', 'depth')
+  node = RecordNode()
+  gate = threading.Event()
+  dag_executor.submit(node, gate.wait, 2)
+  for value in range(1, 4):
+    send(node, value)
+  gate.set()
+  wait_idle(node)
+  # Входы общие для всех запусков: каждый запуск видит последнее записанное значение
+  assert node.runs == [{'default': 3}] * 3
+  assert node.coalesced == node.dropped == 0
@@ -0,0 +1,38 @@
+from models.dag_plan import ExecutionPlan
+
+
+class Node:
+  def __init__(self, name: str):
+    self.id = name
+
+
+def build(names: list, links: list) -> (dict, ExecutionPlan):
+  nodes = {name: Node(name) for name in names}
+  edges = [(nodes[src], 'default', 'in', nodes[dst], 'default') for src, dst in links]
+  return nodes, ExecutionPlan(nodes.values(), edges)
+
+
+def order(plan: ExecutionPlan) -> list:
+  return plan.get_json()['order']
+
+
+def test_topological_order():
+  _, plan = build(['c', 'b', 'a'], [('a', 'b'), ('b', 'c')])
+  assert order(plan) == ['a', 'b', 'c']
+  assert plan.cycles == []
+
+
+def test_cycle_detection():
+  _, plan = build(['a', 'b', 'c'], [('a', 'b'), ('b', 'a'), ('c', 'c')])
+  assert sorted(sorted(cycle) for cycle in plan.get_json()['cycles']) == [['a', 'b'], ['c']]
+
+
+def test_downstream_of_cycle_is_topological():
+  nodes, plan = build(['a', 'b', 'y', 'x'], [('a', 'b'), ('b', 'a'), ('b', 'x'), ('x', 'y')])
+  assert order(plan) == ['a', 'b', 'x', 'y']
+  assert plan.ranks[id(nodes['x'])] < plan.ranks[id(nodes['y'])]
+
+
+def test_cycle_after_its_parents():
+  _, plan = build(['b', 'c', 'root'], [('root', 'b'), ('b', 'c'), ('c', 'b')])
+  assert order(plan) == ['root', 'b', 'c']
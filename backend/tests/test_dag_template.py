@@ -0,0 +1,12 @@
+from dags.condition import ConditionNode
+from models.dag_template import DAGTemplateBase
+
+
+def test_template_input_sets_param_of_inner_node():
+  node = ConditionNode()
+  template = DAGTemplateBase.__new__(DAGTemplateBase)
+  template.input_groups = [{'name': 'limit', 'outputs': [('param', node, 'threshold')]}]
+  template.input_values = {'limit': {'key': ['manual'], 'new_value': (42, 1700000000.0)}}
+
+  template.execute(['limit'])
+  assert node.params['threshold'] == 42
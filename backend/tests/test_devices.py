@@ -0,0 +1,61 @@
+from models.devices import Devices, Port, shared_variant
+
+
+def test_shared_variant_reuses_equal_tuples():
+  assert shared_variant([0, 100, 1, 2]) is shared_variant([0, 100, 1, 2])
+
+
+def test_shared_variant_keeps_element_types():
+  shared_variant([0.0, 100.0, 1.0, 2.0])
+  variant = shared_variant([0, 100, 1, 2])
+  assert [type(value) for value in variant] == [int] * 4
+  assert round(12.345, variant[3]) == 12.35
+
+  shared_variant([1, 0])
+  assert shared_variant([True, False]) == (True, False)
+  assert type(shared_variant([True, False])[0]) is bool
+
+
+def test_shared_variant_pads_to_size():
+  assert shared_variant([0, 100], 4) == (0, 100, None, None)
+  assert shared_variant([]) is None
+
+
+def make_devices(count: int) -> Devices:
+  devices = object.__new__(Devices)  # Без загрузки из БД
+  devices.epoch = 'boot-1'
+  devices.ports = {}
+  for port_id in range(1, count + 1):
+    devices.ports[port_id] = Port(id=port_id, code=f'p{port_id}', label='', access=1, type='numeric',
+                                  values_variant=None, description='', name=f'p{port_id}', mode='exposes',
+                                  unit=None, device_id=1, _device=None)
+    devices.ports[port_id].income_value(port_id)
+  return devices
+
+
+def test_ports_state_delta_and_metadata():
+  devices = make_devices(3)
+  full = devices.ports_state()
+  meta = full[0]
+  assert meta['full'] is True and meta['epoch'] == 'boot-1' and meta['seq'] == Port.last_seq
+  assert sorted(full) == [0, 1, 2, 3]
+  assert full[2]['value'] == 2
+
+  devices.ports[2].income_value(20)
+  delta = devices.ports_state(meta['seq'], 'boot-1')
+  assert sorted(delta) == [0, 2]
+  assert delta[2]['value'] == 20
+  assert delta[0]['full'] is False and delta[0]['seq'] == meta['seq'] + 1
+
+  assert sorted(devices.ports_state(delta[0]['seq'], 'boot-1')) == [0]
+
+
+def test_ports_state_full_snapshot_after_restart():
+  devices = make_devices(2)
+  seq = devices.ports_state()[0]['seq']
+  # Другая эпоха: номер since получен до перезапуска сервера
+  stale = devices.ports_state(seq, 'boot-0')
+  assert stale[0]['full'] is True and sorted(stale) == [0, 1, 2]
+  # since больше текущего номера - счетчик начат заново
+  ahead = devices.ports_state(seq + 1000, 'boot-1')
+  assert ahead[0]['full'] is True and sorted(ahead) == [0, 1, 2]
@@ -0,0 +1,61 @@
+import threading
+
+from orchestrator.executor import DagExecutor
+
+
+class Node:
+  pass
+
+
+def wait_idle(executor: DagExecutor, timeout: float = 2):
+  done, node = threading.Event(), Node()
+  executor.submit(node, done.set)
+  assert done.wait(timeout)
+  for _ in range(200):
+    if not executor.stats()['running']:
+      return
+    threading.Event().wait(0.01)
+
+
+def test_node_tasks_run_in_order():
+  executor = DagExecutor(max_workers=4)
+  node, other = Node(), Node()
+  calls = []
+  for index in range(100):  # Больше batch_size: очередь узла перезапускается в пуле
+    executor.submit(node, calls.append, ('node', index))
+    executor.submit(other, calls.append, ('other', index))
+  wait_idle(executor)
+  assert [index for name, index in calls if name == 'node'] == list(range(100))
+  assert [index for name, index in calls if name == 'other'] == list(range(100))
+
+
+def test_stats_track_workers_without_pool_internals():
+  executor = DagExecutor(max_workers=2)
+  gate = threading.Event()
+  started = threading.Semaphore(0)
+
+  def block():
+    started.release()
+    gate.wait(2)
+
+  nodes = [Node(), Node()]  # Очереди по id(node): узлы должны быть живы
+  for node in nodes:
+    executor.submit(node, block)
+  assert started.acquire(timeout=2) and started.acquire(timeout=2)
+  stats = executor.stats()
+  assert stats['running'] == 2
+  assert stats['max_workers'] == 2
+  gate.set()
+  wait_idle(executor)
+  stats = executor.stats()
+  assert stats['running'] == 0
+  assert stats['peak_running'] == 2
+  assert stats['queued'] == 0
+  assert stats['completed'] == stats['submitted'] == 3
+
+
+def test_errors_are_counted():
+  executor = DagExecutor(max_workers=1)
+  executor.submit(Node(), lambda: 1 / 0)
+  wait_idle(executor)
+  assert executor.stats()['errors'] == 1
@@ -0,0 +1,58 @@
+import threading
+
+from utils import logs
+from utils.configs import config
+
+
+def test_level_gate_drops_before_formatting(monkeypatch):
+  writer = logs.LogWriter()
+  writer._thread = threading.current_thread()  # Без фонового потока
+  monkeypatch.setattr(logs, 'log_writer', writer)
+  monkeypatch.setitem(config['logs'], 'level', 'info')
+
+  class Unprintable:
+    def __str__(self):
+      raise AssertionError('formatted below level')
+
+  logs.log_print('hidden', Unprintable(), level='debug')
+  logs.log_print('shown', 1)
+  assert len(writer.queue) == 1
+  assert writer.queue[0][1:4] == (False, 'test_level_gate_drops_before_formatting', 'test_logs.py')
+  assert writer.queue[0][5] == 'shown 1'
+
+
+def test_writer_queue_is_bounded(monkeypatch, tmp_path):
+  monkeypatch.setattr(logs, 'LOG_DIR', str(tmp_path))
+  monkeypatch.setitem(config['logs'], 'max_queue', 2)
+  writer = logs.LogWriter()
+  writer._thread = threading.current_thread()
+  for index in range(5):
+    writer.add((1700000000.0 + index, False, 'f', 'x.py', 1, f'line {index}'))
+  assert len(writer.queue) == 2
+  assert writer.dropped == 3
+
+  writer.flush()
+  writer.close()
+  text = ''.join(path.read_text(encoding='utf-8') for path in tmp_path.rglob('*.log'))
+  assert 'line 0' in text and 'line 1' in text and 'line 2' not in text
+  assert 'dropped 3 lines' in text
+
+
+def test_broadcast_log_line_is_debug(monkeypatch):
+  from utils.socket_utils import ConnectionManager
+  writer = logs.LogWriter()
+  writer._thread = threading.current_thread()
+  monkeypatch.setattr(logs, 'log_writer', writer)
+  manager = ConnectionManager()
+
+  monkeypatch.setitem(config['logs'], 'level', 'info')
+  manager.broadcast_log(level='value', message='income_value temperature', pin_id=1, value=21.4)
+  assert not writer.queue
+  assert len(manager.logs_queue) == 1  # Событие для веб-сокетов отправляется независимо от уровня лога
+
+  monkeypatch.setitem(config['logs'], 'level', 'debug')
+  manager.broadcast_log(level='value', message='income_value temperature', pin_id=1, value=21.4)
+  assert len(writer.queue) == 1
+  assert writer.queue[0][1] is True  # (SU): строка из broadcast_log, место вызова - уровнем выше
+  assert "'message': 'income_value temperature'" in writer.queue[0][5]
+  assert "'permission'" not in writer.queue[0][5]
@@ -0,0 +1,54 @@
+from models.port_history import PortHistory
+
+
+def test_wraparound_keeps_last_values_in_order():
+  history = PortHistory(capacity=4)
+  for index in range(10):
+    history.add(100.0 + index, index)
+  ts, values = history.snapshot()
+  assert list(ts) == [106.0, 107.0, 108.0, 109.0]
+  assert list(values) == [6.0, 7.0, 8.0, 9.0]
+
+
+def test_partial_buffer_and_non_numeric_values():
+  history = PortHistory(capacity=4)
+  assert history.query() == {'ts': [], 'min': [], 'max': [], 'avg': [], 'count': []}
+  history.add(1.0, '2.5')
+  history.add(2.0, 'on')
+  history.add(3.0, None)
+  history.add(4.0, True)
+  ts, values = history.snapshot()
+  assert list(ts) == [1.0, 4.0]
+  assert list(values) == [2.5, 1.0]
+
+
+def test_query_range_after_wraparound():
+  history = PortHistory(capacity=5)
+  for index in range(8):
+    history.add(float(index), index * 10)
+  result = history.query(since=4.0, until=6.0)
+  assert result['ts'] == [4.0, 5.0, 6.0]
+  assert result['avg'] == [40.0, 50.0, 60.0]
+
+
+def test_query_downsampling():
+  history = PortHistory(capacity=100)
+  for index in range(10):
+    history.add(float(index), index)
+  result = history.query(since=0.0, until=10.0, points=2)
+  assert result['ts'] == [0.0, 5.0]
+  assert result['count'] == [5, 5]
+  assert result['min'] == [0.0, 5.0]
+  assert result['max'] == [4.0, 9.0]
+  assert result['avg'] == [2.0, 7.0]
+
+
+def test_arrays_grow_up_to_capacity():
+  history = PortHistory(capacity=1000)
+  history.add(1.0, 1)
+  assert len(history.ts) == len(history.values) == 1
+  for index in range(2000):
+    history.add(2.0 + index, index)
+  assert len(history.ts) == 1000
+  ts, values = history.snapshot()
+  assert values[0] == 1000.0 and values[-1] == 1999.0
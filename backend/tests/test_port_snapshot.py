@@ -0,0 +1,27 @@
+from models.port_snapshot import save_snapshot, load_snapshot
+
+
+def test_values_keep_their_types(tmp_path):
+  path = str(tmp_path / 'ports.snapshot')
+  items = [
+    (1, 100.0, 21, 21),
+    (2, 101.0, 21.5, 21.5),
+    (3, 102.0, 2 ** 60 + 1, 2 ** 60 + 1),
+    (4, 103.0, 1, 1.0),
+    (5, 104.0, 'on', 'ON'),
+    (6, 105.0, {'state': 1}, None),
+    (7, 106.0, -7, -7),
+  ]
+  save_snapshot(path, items)
+  loaded = list(load_snapshot(path))
+  assert loaded == items
+  for (_, _, value, value_raw), (_, _, loaded_value, loaded_raw) in zip(items, loaded):
+    assert type(loaded_value) is type(value)
+    assert type(loaded_raw) is type(value_raw)
+
+
+def test_missing_or_foreign_file_is_empty(tmp_path):
+  assert list(load_snapshot(str(tmp_path / 'missing'))) == []
+  path = tmp_path / 'foreign'
+  path.write_bytes(b'not a snapshot at all, just some bytes')
+  assert list(load_snapshot(str(path))) == []
@@ -0,0 +1,51 @@
+from models.dag_node import DAGNode
+from orchestrator.process_pool import dag_process_pool
+from utils import logs
+from utils.logs import log_print
+from utils.socket_utils import connection_manager
+
+
+class HeavyNode(DAGNode):
+  """Узел для дочернего процесса: модуль теста импортируется в процессе по имени"""
+  name = 'heavy'
+  run_in_process = True
+  process_state = ('total',)
+  total = 0
+  input_groups = [{'name': 'default', 'description': 'Значение'}]
+
+  def execute(self, input_keys: list):
+    value = self.input_values['default']['new_value'][0]
+    self.total += value
+    self.params['calls'] = (self.params.get('calls') or 0) + 1
+    log_print('🧮 heavy', value)
+    connection_manager.broadcast_log(level='debug', message='🧮 heavy sum', dag=self, value=self.total)
+    self.set_output(self.total)
+
+
+def test_execute_in_process_returns_state_and_forwards_logs(monkeypatch):
+  lines, events = [], []
+  monkeypatch.setattr(logs.log_writer, 'add', lines.append)
+  monkeypatch.setattr(connection_manager, 'broadcast_log', lambda *args, **kwargs: events.append(kwargs))
+  node = HeavyNode()
+  try:
+    for value in (5, 7):
+      node.input_values['default'] = {'key': ['manual'], 'new_value': (value, 1700000000.0)}
+      node._execute(['default'])
+  finally:
+    dag_process_pool.shutdown()
+
+  assert node.total == 12
+  assert node.params['calls'] == 2
+  assert node.updated_output['default']['new_value'][0] == 12
+  assert node.updated_output['default']['key'] == (id(node),)  # id копии узла заменен на id узла
+
+  # Строки log_print сохраняют место вызова в дочернем процессе
+  heavy_lines = [line for line in lines if line[5].startswith('🧮 heavy')]
+  assert [line[5] for line in heavy_lines] == ['🧮 heavy 5', '🧮 heavy 7']
+  assert all(line[2:4] == ('execute', 'test_process_pool.py') for line in heavy_lines)
+
+  # broadcast_log повторяется в родителе от имени исходного узла
+  sums = [event for event in events if event.get('message') == '🧮 heavy sum']
+  assert [event['value'] for event in sums] == [5, 12]
+  assert all(event['dag'] is node for event in events)
+  assert [event['message'] for event in events].count('🤜 set dag output') == 2
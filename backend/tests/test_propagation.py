@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+from models.dag_node import DAGNode
+from models.root_dag import rootDag
+from orchestrator.executor import dag_executor
+from orchestrator.propagation import propagation_stats
+from utils.configs import config
+
+
+class AddNode(DAGNode):
+  """Сумма обновленных входов плюс add. Запоминает каждый запуск"""
+  name = 'add'
+  input_groups = [{'name': 'default'}, {'name': 'b'}, {'name': 'c'}]
+
+  def __init__(self, add: int):
+    super().__init__()
+    self.add = add
+    self.runs = []
+    self.done = threading.Event()
+
+  def execute(self, input_keys: list):
+    values = {key: self.input_values[key]['new_value'][0] for key in input_keys}
+    self.runs.append((sorted(input_keys), values))
+    self.set_output(sum(values.values()) + self.add)
+    self.done.set()
+
+
+def test_wave_runs_diamond_join_once_with_merged_inputs(monkeypatch):
+  monkeypatch.setitem(config['dags'], 'propagation', 'wave')
+  root = rootDag()
+  a, b, c, d = AddNode(1), AddNode(10), AddNode(100), AddNode(0)
+
+  async def build():
+    for node in (d, c, b, a):  # Порядок добавления не совпадает с топологическим
+      await root.add_dag(node)
+    await a.add_output(b, send_update=False)
+    await a.add_output(c, send_update=False)
+    await b.add_output(d, input_child_group='b', send_update=False)
+    await c.add_output(d, input_child_group='c', send_update=False)
+
+  asyncio.run(build())
+  merged = propagation_stats.merged
+
+  a.set_input({'key': ['test'], 'new_value': (1, 1700000000.0)}, 'default')
+  a.process(['default'])
+  assert d.done.wait(2)
+  idle = threading.Event()
+  dag_executor.submit(a, idle.set)  # Волна выполняется в очереди узла a
+  assert idle.wait(2)
+
+  assert [values for _, values in b.runs] == [{'default': 2}]
+  assert [values for _, values in c.runs] == [{'default': 2}]
+  assert d.runs == [(['b', 'c'], {'b': 12, 'c': 102})]
+  assert propagation_stats.merged - merged == 1
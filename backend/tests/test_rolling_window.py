@@ -0,0 +1,88 @@
+from math import isclose, sqrt
+import random
+
+import pytest
+
+from models.rolling_window import RollingWindow
+
+
+class Reference:
+  """Окно перебором: список (key, value, ts) от старых к новым"""
+
+  def __init__(self, max_count: int, ttl: float, keyed: bool):
+    self.max_count, self.ttl, self.keyed = max_count, ttl, keyed
+    self.items = []
+
+  def push(self, value: float, ts: float, key):
+    if self.keyed:
+      self.items = [item for item in self.items if item[0] != key]
+    self.items.append((key, value, ts))
+    if self.max_count > 0:
+      self.items = self.items[-self.max_count:]
+
+  def expire(self, now: float):
+    if self.ttl > 0:
+      while self.items and now - self.items[0][2] > self.ttl:
+        self.items.pop(0)
+
+  def percentile(self, p: float) -> float:
+    values = sorted(value for _, value, _ in self.items)
+    position = (len(values) - 1) * p / 100
+    index = int(position)
+    if index + 1 >= len(values):
+      return values[index]
+    return values[index] + (values[index + 1] - values[index]) * (position - index)
+
+
+def assert_matches(window: RollingWindow, reference: Reference):
+  values = [value for _, value, _ in reference.items]
+  assert len(window) == len(values)
+  if not values:
+    return
+  mean = sum(values) / len(values)
+  assert isclose(window.sum, sum(values), rel_tol=1e-9, abs_tol=1e-6)
+  assert isclose(window.mean, mean, rel_tol=1e-9, abs_tol=1e-9)
+  assert window.min == min(values)
+  assert window.max == max(values)
+  stddev = sqrt(sum((value - mean) ** 2 for value in values) / len(values))
+  assert isclose(window.stddev, stddev, rel_tol=1e-6, abs_tol=1e-6)
+  if window.ordered:
+    for p in (0, 10, 50, 90, 99, 100):
+      assert isclose(window.percentile(p), reference.percentile(p), rel_tol=1e-12, abs_tol=1e-12)
+  first, last = reference.items[0], reference.items[-1]
+  rate = 0.0 if len(values) < 2 or last[2] == first[2] else (last[1] - first[1]) / (last[2] - first[2])
+  assert isclose(window.rate, rate, rel_tol=1e-9, abs_tol=1e-9)
+
+
+@pytest.mark.parametrize('max_count, ttl, ordered, keyed', [
+  (50, 0, False, False),
+  (0, 5, True, False),
+  (20, 3, True, False),
+  (0, 10, False, True),
+])
+def test_matches_brute_force(max_count, ttl, ordered, keyed):
+  rng = random.Random(f'{max_count}-{ttl}-{ordered}-{keyed}')
+  window = RollingWindow(max_count=max_count, ttl=ttl, ordered=ordered, keyed=keyed)
+  window.resync_every = 97  # Пересчет сумм тоже проверяется
+  reference = Reference(max_count, ttl, keyed)
+  now = 1700000000.0
+  for _ in range(2000):
+    now += rng.random()
+    value = rng.choice([rng.uniform(-100, 100), float(rng.randint(-3, 3)), 1e6 + rng.random()])
+    key = (rng.randint(0, 7),) if keyed else None
+    window.expire(now)
+    reference.expire(now)
+    window.push(value, now, key)
+    reference.push(value, now, key)
+    assert_matches(window, reference)
+
+
+def test_expire_empties_window():
+  window = RollingWindow(ttl=1)
+  window.push(5.0, 100.0)
+  window.push(7.0, 100.5)
+  window.expire(102.0)
+  assert len(window) == 0
+  assert window.sum == 0.0
+  window.push(1.0, 103.0)
+  assert window.mean == window.min == window.max == 1.0
@@ -0,0 +1,29 @@
+import asyncio
+
+from dags.delay import DelayNode
+from dags.scheduler import SchedulerNode
+from models.root_dag import rootDag
+
+
+def test_remove_dag_stops_node_and_drops_its_links():
+  root = rootDag()
+  scheduler, delay = SchedulerNode(), DelayNode()
+  assert scheduler.timer.active
+
+  async def build():
+    await root.add_dag(scheduler)
+    await root.add_dag(delay)
+    await scheduler.add_output(delay, send_update=False)
+
+  asyncio.run(build())
+  timer = scheduler.timer
+  assert root.get_plan().incoming_edges(delay)
+
+  assert root.remove_dag(scheduler.id)
+  assert not timer.active
+  assert scheduler.timer is None
+  assert scheduler.outputs == {}
+  assert scheduler.root_dag is None
+  assert list(root.dags) == [delay.id]
+  assert not root.get_plan().incoming_edges(delay)
+  assert not root.remove_dag(scheduler.id)
@@ -0,0 +1,28 @@
+from datetime import datetime
+from unittest import mock
+
+from crontab import CronTab
+
+from dags.scheduler import SchedulerNode
+
+
+def make_node(schedule: str) -> SchedulerNode:
+  node = SchedulerNode.__new__(SchedulerNode)
+  node.cron = CronTab(schedule)
+  return node
+
+
+def test_next_run_at_after_early_fire():
+  node = make_node('* * * * *')
+  slot = datetime(2026, 1, 1, 0, 1, 0).timestamp()
+  # Срабатывание за 0.3 с до слота: следующий запуск - через минуту, а не тот же слот
+  with mock.patch('dags.scheduler.time', return_value=slot - 0.3):
+    assert node.next_run_at(after=slot) == slot + 60
+    assert node.next_run_at() == slot
+
+
+def test_next_run_at_seconds_field():
+  node = make_node('*/5 * * * * * *')
+  now = datetime(2026, 1, 1, 0, 1, 2).timestamp()
+  with mock.patch('dags.scheduler.time', return_value=now):
+    assert node.next_run_at() == now + 3
@@ -0,0 +1,152 @@
+from time import monotonic
+from types import SimpleNamespace
+import asyncio
+
+import pytest
+
+from utils.configs import config
+from utils.socket_utils import ClientChannel, ConnectionManager, message_topics
+
+
+def test_events_wait_for_loop_and_are_bounded(monkeypatch):
+  monkeypatch.setitem(config['ws'], 'pending_size', 3)
+  manager = ConnectionManager()
+  for index in range(5):
+    manager.enqueue({'type': 'log', 'message': str(index), 'ts': index})
+  # Без цикла событий очередь не разбирается в потоке отправителя
+  assert len(manager.logs_history) == 0
+  assert [data['message'] for data, _, _ in manager.logs_queue] == ['2', '3', '4']
+  assert manager.dropped_pending == 2
+
+  async def startup():
+    manager.set_loop(asyncio.get_running_loop())
+    await asyncio.sleep(0)
+    manager.enqueue({'type': 'log', 'message': '5', 'ts': 5})
+    await asyncio.sleep(0)
+
+  asyncio.run(startup())
+  assert [item['message'] for item in manager.logs_history.query()] == ['2', '3', '4', '5']
+  assert not manager.logs_queue
+
+
+class FakeSocket:
+  """Веб-сокет клиента: записывает отправленные кадры"""
+
+  def __init__(self, host: str = 'client'):
+    self.client = SimpleNamespace(host=host)
+    self.frames = []
+    self.closed = None
+
+  async def send_text(self, text: str):
+    self.frames.append(text)
+
+  async def send_bytes(self, data: bytes):
+    self.frames.append(data)
+
+  async def close(self, code: int = 1000):
+    self.closed = code
+
+
+def test_subscribed_socket_receives_matching_topics_only():
+  manager = ConnectionManager()
+  everything, dags, ports = FakeSocket(), FakeSocket(), FakeSocket()
+  manager.active_connections = [everything, dags, ports]
+  manager.subscribe(dags, ['dag:7'])
+  manager.subscribe(ports, ['port:3', 'type:log'])
+
+  dag_update = {'type': 'dag', 'action': 'update_params', 'data': {'id': 7, 'params': {}}}
+  port_value = {'type': 'port', 'level': 'value', 'pin_id': 3, 'value': 1}
+  device_log = {'type': 'log', 'level': 'value', 'device_id': 5, 'message': 'income_value'}
+  other_port = {'type': 'port', 'level': 'value', 'pin_id': 4, 'value': 1}
+
+  assert message_topics(port_value) == {'type:port', 'level:value', 'port:3'}
+  assert manager.recipients(dag_update) == [everything, dags]
+  assert manager.recipients(port_value) == [everything, ports]
+  assert manager.recipients(device_log) == [everything, ports]
+  assert manager.recipients(other_port) == [everything]
+
+  manager.unsubscribe(ports)
+  assert manager.recipients(other_port) == [everything, ports]
+
+
+def test_channel_drop_oldest_and_lag(monkeypatch):
+  monkeypatch.setitem(config['ws'], 'queue_size', 2)
+  monkeypatch.setitem(config['ws'], 'overflow', 'drop_oldest')
+  manager = ConnectionManager()
+  socket = FakeSocket()
+
+  async def run():
+    channel = ClientChannel(manager, socket)
+    queued_at = monotonic() - 0.05
+    for index in range(4):  # Задача записи еще не запускалась - очередь переполняется
+      channel.put(f'"{index}"', queued_at)
+    assert channel.dropped == 2
+    await asyncio.sleep(0.01)
+    channel.close()
+    return channel
+
+  channel = asyncio.run(run())
+  assert socket.frames == ['"2"', '"3"']
+  assert channel.sent == channel.frames == 2
+  assert channel.lag_ms >= 50 and channel.max_lag_ms >= channel.lag_ms
+  assert manager.send_latency.get_json(with_buckets=False)['count'] == 2
+
+
+def test_channel_disconnects_slow_client(monkeypatch):
+  monkeypatch.setitem(config['ws'], 'queue_size', 1)
+  monkeypatch.setitem(config['ws'], 'overflow', 'disconnect')
+  manager = ConnectionManager()
+  socket = FakeSocket()
+
+  async def run():
+    manager.active_connections.append(socket)
+    channel = manager.channels[socket] = ClientChannel(manager, socket)
+    channel.put('"0"')
+    channel.put('"1"')
+    await asyncio.sleep(0.01)
+    return channel
+
+  channel = asyncio.run(run())
+  assert socket not in manager.active_connections and socket not in manager.channels
+  assert socket.closed == 1013
+  assert channel.dropped == 0
+  assert socket.frames == []
+
+
+def test_batch_joins_text_and_binary_runs():
+  msgpack = pytest.importorskip('msgpack')
+  manager = ConnectionManager()
+  socket = FakeSocket()
+  items = ['{"n": 1}', '{"n": 2}', msgpack.packb(3), msgpack.packb(4), '{"n": 5}']
+
+  async def run():
+    channel = ClientChannel(manager, socket)
+    assert channel.set_batch(window_ms=10, max_events=10) == {'window_ms': 10.0, 'max_events': 10}
+    for item in items:
+      channel.put(item)
+    await asyncio.sleep(0.05)
+    channel.close()
+    return channel
+
+  channel = asyncio.run(run())
+  # Смена формата в очереди - отдельный кадр на каждую серию одного типа
+  assert socket.frames[0] == '[{"n": 1},{"n": 2}]'
+  assert msgpack.unpackb(socket.frames[1]) == [3, 4]
+  assert socket.frames[2] == '[{"n": 5}]'
+  assert channel.sent == 5 and channel.frames == 3
+
+
+def test_batch_respects_max_events():
+  manager = ConnectionManager()
+  socket = FakeSocket()
+
+  async def run():
+    channel = ClientChannel(manager, socket)
+    channel.set_batch(window_ms=10, max_events=2)
+    for index in range(5):
+      channel.put(str(index))
+    await asyncio.sleep(0.05)
+    channel.close()
+
+  asyncio.run(run())
+  assert socket.frames == ['[0,1]', '[2,3]', '[4]']
@@ -0,0 +1,30 @@
+from time import sleep
+import threading
+
+from orchestrator.timers import TimerService, timer_service
+
+
+def test_fire_and_cancel_counters():
+  fired = threading.Event()
+  before = timer_service.stats()
+  timer = timer_service.arm(0.01, fired.set)
+  cancelled = timer_service.arm(10, fired.set)
+  cancelled.cancel()
+  cancelled.cancel()  # Повторная отмена не считается
+  assert fired.wait(2)
+  sleep(0.01)
+  timer.cancel()  # Отмена сработавшего таймера не считается
+  after = timer_service.stats()
+  assert after['fired'] - before['fired'] == 1
+  assert after['cancelled'] - before['cancelled'] == 1
+  assert after['active'] == before['active']
+
+
+def test_timer_counts_on_its_own_service():
+  service = TimerService()
+  before = timer_service.stats()
+  timer = service.arm(10, lambda: None)
+  timer.cancel()
+  assert timer.service is service
+  assert service.stats()['cancelled'] == 1 and service.stats()['active'] == 0
+  assert timer_service.stats()['cancelled'] == before['cancelled']
@@ -0,0 +1,38 @@
+import pytest
+
+from utils.configs import config
+from utils.timeseries import TimeSeriesStore
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+  monkeypatch.setitem(config['timeseries'], 'enabled', True)
+  monkeypatch.setitem(config['timeseries'], 'path', str(tmp_path / 'timeseries.db'))
+  store = TimeSeriesStore()
+  store._thread = object()  # Запись вручную через flush, без фонового потока
+  return store
+
+
+def test_disabled_by_default():
+  from utils.configs import default_config
+  assert default_config['timeseries']['enabled'] is False
+
+
+def test_rollups_do_not_count_replaced_rows(store):
+  base = 1700000000 // 3600 * 3600
+  store.add(1, base + 1, 10)
+  store.add(1, base + 2, 20)
+  store.flush()
+  store.add(1, base + 2, 30)  # Та же метка времени - замена значения
+  store.add(1, base + 61, 5)
+  store.flush()
+
+  raw = store.query(1, base, base + 3600, 'raw')
+  assert raw['avg'] == [10, 30, 5]
+  minutes = store.query(1, base, base + 3600, '1m')
+  assert minutes['count'] == [2, 1]
+  assert minutes['avg'] == [20, 5]
+  assert (minutes['min'], minutes['max']) == ([10, 5], [30, 5])
+  hours = store.query(1, base, base + 3600, '1h')
+  assert hours['count'] == [3]
+  assert hours['avg'] == [15]
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from utils import ws_codec
+
+msgpack = pytest.importorskip('msgpack')
+
+MESSAGES = [
+  {'type': 'log', 'level': 'value', 'permission': 'admin', 'message': 'income_value temperature',
+   'device_id': 12, 'pin_id': 341, 'value': 21.4, 'ts': 1700000000.5},
+  {'type': 'port', 'level': 'value', 'permission': 'all', 'pin_id': 341, 'value': 21.4, 'action': 'in',
+   'ts': 1700000000.5},
+  {'type': 'dag', 'action': 'update_params', 'data': {'id': 1, 'params': {'value': 21.4}}},
+]
+
+
+def expand(item):
+  """Обратное преобразование компактной раскладки, как на клиенте"""
+  if not isinstance(item, list):
+    return item
+  data = {'type': item[0], **dict(zip(ws_codec.LOG_KEYS, item[1:]))}
+  return {key: value for key, value in data.items() if value is not None}
+
+
+@pytest.mark.parametrize('message', MESSAGES)
+def test_round_trip(message):
+  assert json.loads(ws_codec.encode(message)) == message
+  assert expand(json.loads(ws_codec.encode(message, 'compact'))) == message
+  assert expand(msgpack.unpackb(ws_codec.encode(message, 'msgpack'))) == message
+
+
+@pytest.mark.parametrize('count', [1, 15, 16, 300])
+def test_join_batch(count):
+  messages = [MESSAGES[index % len(MESSAGES)] for index in range(count)]
+  text = ws_codec.join_batch([ws_codec.encode(message, 'compact') for message in messages])
+  assert [expand(item) for item in json.loads(text)] == messages
+  binary = ws_codec.join_batch([ws_codec.encode(message, 'msgpack') for message in messages])
+  assert [expand(item) for item in msgpack.unpackb(binary)] == messages
+
+
+@pytest.mark.parametrize('count, header', [(0xffff, b'\xdc\xff\xff'), (0x10000, b'\xdd\x00\x01\x00\x00')])
+def test_join_batch_large_msgpack_arrays(count, header):
+  item = ws_codec.encode(MESSAGES[1], 'msgpack')
+  binary = ws_codec.join_batch([item] * count)
+  assert binary.startswith(header + item)
+  assert len(msgpack.unpackb(binary)) == count
@@ -32,6 +32,40 @@ default_config = {
     'ttl_days': 7,
     'max_logs_per_group': 100,
   },
+  'dags': {
+    'max_workers': 4,
+    'process_workers': 2,  # Процессы для узлов с run_in_process
+    'propagation': 'depth',  # depth | wave
+    'metrics_interval': 0,  # Период отправки метрик узлов в websocket, секунды. 0 - не отправлять
+    'checkpoint_path': '../store/dag_state.jsonl',  # Внутреннее состояние узлов между перезапусками
+    'checkpoint_interval': 30,  # Секунды между записями состояния. 0 - только при остановке
+  },
+  'ports': {
+    'history_size': 120,  # Точек истории значений в памяти на порт (16 байт на точку). 0 - не хранить
+    'snapshot_path': '../store/ports_snapshot.bin',  # Последние значения для теплого перезапуска
+    'snapshot_interval': 60,  # Секунды между снимками. 0 - только при остановке и /api/restart
+  },
+  'timeseries': {
+    'enabled': False,  # Запись истории портов в SQLite - включается вручную
+    'path': '../store/timeseries.db',
+    'flush_interval': 5,  # Секунды между записями пакетов
+    'batch_size': 5000,
+    'max_queue': 200000,  # При переполнении новые значения отбрасываются
+    'raw_days': 7,
+    'minute_days': 90,
+    'hour_days': 730,
+  },
+  'logs': {
+    'level': 'info',  # debug | info | warning | error - строки ниже уровня не форматируются и не пишутся
+    'max_queue': 100000,  # Строк в очереди записи. При переполнении новые строки отбрасываются
+  },
+  'ws': {
+    'queue_size': 1000,  # Сообщений в очереди отправки одного клиента
+    'overflow': 'drop_oldest',  # drop_oldest | disconnect - что делать с медленным клиентом
+    'batch_max_window_ms': 1000,  # Ограничения для пакетной отправки, которую включает клиент
+    'batch_max_events': 500,
+    'pending_size': 10000,  # Событий в очереди до запуска цикла событий. Лишние (самые старые) отбрасываются
+  },
   'auto_icon_finder': True
 }
 
@@ -0,0 +1,76 @@
+from collections import deque
+from typing import Dict, List
+import threading
+
+
+class LogHistory:
+  """
+  Кольцевой буфер последних сообщений логов фиксированного размера.
+  Каждому сообщению присваивается порядковый номер seq, запись по индексу seq % capacity.
+  Вторичные индексы (dag_id, device_id, pin_id, level) - очереди seq по значению поля:
+  выборка по полю просматривает только сообщения с этим значением, от новых к старым.
+  """
+  index_fields = ('dag_id', 'device_id', 'pin_id', 'level')
+
+  def __init__(self, capacity: int):
+    self.capacity = capacity
+    self.items: list = [None] * capacity  # (seq, data, permission)
+    self.seq = 0  # Номер последнего добавленного сообщения
+    self.indexes: Dict[str, Dict[object, deque]] = {field: {} for field in self.index_fields}
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return min(self.seq, self.capacity)
+
+  def append(self, data: dict, permission: str = 'all') -> int:
+    with self._lock:
+      self.seq += 1
+      position = self.seq % self.capacity
+      evicted = self.items[position]
+      if evicted is not None:
+        self._unindex(evicted)
+      self.items[position] = (self.seq, data, permission)
+      for field in self.index_fields:
+        value = data.get(field)
+        if value is not None:
+          self.indexes[field].setdefault(value, deque()).append(self.seq)
+      return self.seq
+
+  def _unindex(self, item: tuple):
+    """Вытесняемое сообщение - самое старое, в очередях индексов оно первое"""
+    seq, data, _ = item
+    for field in self.index_fields:
+      value = data.get(field)
+      if value is None:
+        continue
+      seqs = self.indexes[field].get(value)
+      if seqs and seqs[0] == seq:
+        seqs.popleft()
+        if not seqs:
+          del self.indexes[field][value]
+
+  def _iter_seqs(self, filters: dict):
+    """Номера сообщений от новых к старым: по самому короткому индексу из фильтров или весь буфер"""
+    candidates = [self.indexes[field].get(value, ()) for field, value in filters.items()]
+    if candidates:
+      return reversed(min(candidates, key=len))
+    return range(self.seq, max(0, self.seq - self.capacity), -1)
+
+  def query(self, since: float = None, after: int = None, limit: int = 1000, **filters) -> List[dict]:
+    """
+    Последние сообщения (не более limit) в хронологическом порядке.
+    since - метка времени ts, after - номер seq. filters: dag_id, device_id, pin_id, level
+    """
+    filters = {field: value for field, value in filters.items() if value is not None}
+    result = []
+    with self._lock:
+      for seq in self._iter_seqs(filters):
+        if len(result) >= limit or (after is not None and seq <= after):
+          break
+        _, data, _ = self.items[seq % self.capacity]
+        if since is not None and data.get('ts', 0) < since:
+          break
+        if all(data.get(field) == value for field, value in filters.items()):
+          result.append({**data, 'seq': seq})
+    result.reverse()
+    return result
@@ -1,48 +1,140 @@
-import os
-import inspect
-import asyncio
+from collections import deque
 from datetime import datetime, timedelta
-from typing import List
+from time import time
+import asyncio
+import atexit
+import os
+import sys
+import threading
+
+from utils.configs import config
 
 LOG_DIR = os.path.abspath('../store/logs')
 if not os.path.exists(LOG_DIR):
   os.makedirs(LOG_DIR, exist_ok=True)
 
-
-def log_print(*msg):
-  su = 'socket_utils.py' in inspect.stack()[1].filename
-  frame = inspect.stack()[2] if su else inspect.stack()[1]
-  clicksource = frame.function
-  filename = frame.filename.split('/')[-1]
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+
+
+class LogWriter:
+  """
+  Фоновая запись логов: строки из log_print копятся в очереди, поток пишет их пачками
+  в консоль и в часовой файл. Файл текущего часа остается открытым до смены часа.
+  Очередь ограничена logs.max_queue: если запись не успевает (медленный диск), новые строки
+  отбрасываются, их количество пишется в лог при следующей записи
+  """
+
+  def __init__(self):
+    self.queue = deque()  # (ts, su, function, filename, lineno, text)
+    self._wake = threading.Event()
+    self._lock = threading.Lock()
+    self._thread: threading.Thread = None
+    self._file = None
+    self._file_path: str = None
+    self.written = 0
+    self.dropped = 0
+    self._reported_dropped = 0
+
+  def add(self, item: tuple):
+    if len(self.queue) >= (config['logs'] or {}).get('max_queue', 100000):
+      self.dropped += 1
+      return
+    self.queue.append(item)
+    if self._thread is None:
+      self._start()
+    self._wake.set()
+
+  def _start(self):
+    with self._lock:
+      if self._thread is None:
+        self._thread = threading.Thread(target=self._run, name='log_writer', daemon=True)
+        self._thread.start()
+
+  def _run(self):
+    while True:
+      self._wake.wait()
+      self._wake.clear()
+      try:
+        self.flush()
+      except Exception as e:
+        sys.stderr.write(f'log writer error: {e}\n')
+
+  def flush(self):
+    """Записывает накопленные строки. Можно вызывать из любого потока"""
+    with self._lock:
+      lines = []
+      hour = None
+      while self.queue:
+        ts, su, function, filename, lineno, text = self.queue.popleft()
+        timestamp = datetime.fromtimestamp(ts)
+        if timestamp.hour != hour and lines:
+          self._write(lines, hour_time)
+          lines = []
+        hour, hour_time = timestamp.hour, timestamp
+        msg_parts = [
+          timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+          '(SU)' if su else None,
+          function,
+          f'{filename}:{lineno}',
+          text
+        ]
+        lines.append(' - '.join(filter(None, msg_parts)))
+      if self.dropped != self._reported_dropped:
+        hour_time = datetime.now() if hour is None else hour_time
+        lines.append(f'{hour_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]} - 💥 log queue overflow, '
+                     f'dropped {self.dropped - self._reported_dropped} lines')
+        self._reported_dropped = self.dropped
+      if lines:
+        self._write(lines, hour_time)
+
+  def _write(self, lines: list, timestamp: datetime):
+    text = '\n'.join(lines) + '\n'
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+    # Путь к hourly-логу: файл держится открытым, пока не сменится час
+    full_path = os.path.join(LOG_DIR, timestamp.strftime('%Y/%m/%d'), f"{timestamp.strftime('%H')}.log")
+    if full_path != self._file_path:
+      self.close()
+      os.makedirs(os.path.dirname(full_path), exist_ok=True)
+      self._file = open(full_path, 'a', encoding='utf-8')
+      self._file_path = full_path
+    self._file.write(text)
+    self._file.flush()
+    self.written += len(lines)
+
+  def close(self):
+    if self._file is not None:
+      self._file.close()
+      self._file = None
+      self._file_path = None
+
+
+log_writer = LogWriter()
+atexit.register(log_writer.flush)
+
+
+def log_enabled(level: str) -> bool:
+  """Пишется ли уровень при текущем config['logs']['level']. Для проверки до сборки сообщения"""
+  return LEVELS.get(level, 20) >= LEVELS.get((config['logs'] or {}).get('level'), 20)
+
+
+def log_print(*msg, level: str = 'info'):
+  """
+  Строка лога с местом вызова. Уровень ниже config['logs']['level'] отбрасывается до форматирования.
+  Место вызова - через sys._getframe, время и запись в файл - в фоновом потоке
+  """
+  if not log_enabled(level):
+    return
+  frame = sys._getframe(1)
+  su = frame.f_code.co_filename.endswith('socket_utils.py')
+  if su:
+    frame = frame.f_back
+  code = frame.f_code
+  filename = code.co_filename.split('/')[-1]
   if filename == '__init__.py':
-    filename = frame.filename.split('/')[-2] + '/'
-  lineno = frame.lineno
-
-  timestamp = datetime.now()
-  time_str = timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-  msg_parts = [
-    time_str,
-    '(SU)' if su else None,
-    clicksource,
-    f'{filename}:{lineno}',
-    ' '.join(map(str, msg))
-  ]
-  line = ' - '.join(filter(None, msg_parts))
-
-  print(line)
-
-  # Формируем путь к hourly-логу
-  log_path = os.path.join(
-    LOG_DIR,
-    timestamp.strftime('%Y/%m/%d')
-  )
-  os.makedirs(log_path, exist_ok=True)
-
-  file_name = f"{timestamp.strftime('%H')}.log"
-  full_path = os.path.join(log_path, file_name)
-
-  with open(full_path, 'a', encoding='utf-8') as f:
-    f.write(line + '\n')
+    filename = code.co_filename.split('/')[-2] + '/'
+  log_writer.add((time(), su, code.co_name, filename, frame.f_lineno, ' '.join(map(str, msg))))
 
 
 def get_logs(year=None, month=None, day=None, hour=None):
@@ -175,6 +267,23 @@ def init_routes(app):
   async def get_logs_route(year: int = None, month: int = None, day: int = None, hour: int = None):
     return get_logs(year, month, day, hour)
 
+  @app.get('/api/logs/live',
+           tags=["live/logs"],
+           dependencies=[Depends(RoleChecker('admin'))])
+  async def live_logs_route(dag_id: str = None, device_id: int = None, pin_id: int = None, level: str = None,
+                            since: float = None, after: int = None, limit: int = 1000):
+    """
+    Последние сообщения из памяти (то, что уходит в веб-сокет), с фильтрами.
+    since - метка времени, after - seq последнего полученного сообщения
+    """
+    from utils.socket_utils import connection_manager
+    history = connection_manager.logs_history
+    if dag_id is not None and dag_id.lstrip('-').isdigit():
+      dag_id = int(dag_id)  # id узлов - числа, id шаблонов - строки tpl:...
+    return {'seq': history.seq,
+            'data': history.query(since=since, after=after, limit=limit, dag_id=dag_id, device_id=device_id,
+                                  pin_id=pin_id, level=level)}
+
   @app.get('/api/logs/tree',
            tags=["live/logs"],
            dependencies=[Depends(RoleChecker('admin'))])
@@ -1,50 +1,215 @@
-from fastapi import WebSocket, WebSocketDisconnect
-from typing import List
+from fastapi import WebSocket
+from collections import deque
+from typing import Dict, List, Set
 import asyncio
 
 from datetime import datetime
+from time import monotonic
 import json
-from utils.logs import log_print
-import threading
+from orchestrator.metrics import Histogram
+from utils.configs import config
+from utils.log_history import LogHistory
+from utils.ws_codec import encode, encodings, join_batch, schema
+from utils.logs import log_enabled, log_print
 
 
-# Define a custom function to serialize datetime objects
-def serialize_datetime(obj):
-  if isinstance(obj, datetime):
-    return obj.isoformat()
-  print("Type not serializable", obj)
-  raise TypeError("Type not serializable")
+def message_topics(data: dict) -> Set[str]:
+  """
+  Темы сообщения для подписок клиентов:
+  type:<type>, level:<level>, dag:<dag_id>, template:<tpl_id>, device:<device_id>, port:<port_id>
+  """
+  if not isinstance(data, dict):
+    return set()
+  topics = {f'type:{data.get("type")}'}
+  payload = data.get('data') if isinstance(data.get('data'), dict) else {}
+  if 'level' in data:
+    topics.add(f'level:{data["level"]}')
+  dag_id = data.get('dag_id', payload.get('id') if data.get('type') == 'dag' else None)
+  if dag_id is not None:
+    topics.add(f'dag:{dag_id}')
+  tpl_id = data.get('tpl_id')
+  if tpl_id is None and str(payload.get('page', '')).startswith('vtpl:'):
+    tpl_id = payload['page'][1:]
+  if tpl_id is not None:
+    topics.add(f'template:{tpl_id}')
+  if 'device_id' in data:
+    topics.add(f'device:{data["device_id"]}')
+  port_id = data.get('port_id', data.get('pin_id') if data.get('type') == 'port' else None)
+  if port_id is not None:
+    topics.add(f'port:{port_id}')
+  return topics
+
+
+class ClientChannel:
+  """
+  Очередь отправки одного клиента: ограниченная asyncio.Queue и отдельная задача записи.
+  Медленный клиент не задерживает остальных - при переполнении очереди действует политика overflow:
+  drop_oldest - отбросить самое старое сообщение, disconnect - отключить клиента.
+  В режиме пакетов (команда batch) сообщения за окно batch_window отправляются одним кадром-массивом.
+  encoding - формат кадров клиента (utils/ws_codec.py)
+  """
+
+  def __init__(self, manager: "ConnectionManager", websocket: WebSocket):
+    self.manager = manager
+    self.websocket = websocket
+    self.queue = asyncio.Queue(maxsize=config['ws']['queue_size'])
+    self.encoding = 'json'
+    self.batch_window = 0.0  # Секунды. 0 - каждое сообщение отдельным кадром
+    self.batch_size = 0
+    self.sent = 0
+    self.frames = 0
+    self.dropped = 0
+    self.lag_ms = 0.0  # Время от постановки в очередь до отправки последнего сообщения
+    self.max_lag_ms = 0.0
+    self.connected_at = datetime.now()
+    self.task = asyncio.create_task(self._writer())
+
+  def put(self, payload, queued_at: float = None):
+    """
+    payload - закодированное сообщение: str (текстовый кадр) или bytes (бинарный).
+    queued_at - monotonic() постановки события в очередь (для метрики задержки до отправки)
+    """
+    if self.queue.full():
+      if config['ws']['overflow'] == 'disconnect':
+        log_print("Disconnecting slow client", self.websocket.client.host)
+        self.manager.disconnect(self.websocket)
+        asyncio.create_task(self.websocket.close(code=1013))
+        return
+      self.queue.get_nowait()
+      self.dropped += 1
+    self.queue.put_nowait((payload, queued_at or monotonic()))
+
+  async def _writer(self):
+    try:
+      while True:
+        payload, queued_at = await self.queue.get()
+        frames = [payload]
+        count = 1
+        if self.batch_window > 0:
+          frames, count = await self._collect(payload)
+        for frame in frames:
+          if isinstance(frame, bytes):
+            await self.websocket.send_bytes(frame)
+          else:
+            await self.websocket.send_text(frame)
+        self.sent += count
+        self.frames += len(frames)
+        self.lag_ms = (monotonic() - queued_at) * 1000
+        if self.lag_ms > self.max_lag_ms:
+          self.max_lag_ms = self.lag_ms
+        self.manager.send_latency.add(self.lag_ms)
+    except asyncio.CancelledError:
+      pass
+    except Exception as e:  # WebSocketDisconnect, закрытое соединение
+      log_print("Disconnecting", self.websocket.client.host, e)
+      self.manager.disconnect(self.websocket)
+
+  async def _collect(self, payload) -> (list, int):
+    """
+    Собирает сообщения за окно пакета в кадр-массив. Сообщения уже закодированы - только склейка.
+    После смены формата в очереди могут остаться сообщения прежнего формата - они уходят отдельным кадром
+    """
+    if self.queue.qsize() + 1 < self.batch_size:
+      await asyncio.sleep(self.batch_window)
+    items = [payload]
+    while len(items) < self.batch_size and not self.queue.empty():
+      items.append(self.queue.get_nowait()[0])
+    runs = []
+    for item in items:
+      if runs and type(runs[-1][0]) is type(item):
+        runs[-1].append(item)
+      else:
+        runs.append([item])
+    return [join_batch(run) for run in runs], len(items)
+
+  def set_batch(self, window_ms: float = 0, max_events: int = None) -> dict:
+    settings = config['ws']
+    self.batch_window = max(0.0, min(float(window_ms or 0), settings['batch_max_window_ms'])) / 1000
+    self.batch_size = max(1, min(int(max_events or settings['batch_max_events']), settings['batch_max_events']))
+    return {'window_ms': self.batch_window * 1000, 'max_events': self.batch_size}
+
+  def close(self):
+    if self.task is not asyncio.current_task():
+      self.task.cancel()
+
+  def stats(self) -> dict:
+    return {
+      'host': self.websocket.client.host,
+      'connected_at': self.connected_at,
+      'topics': sorted(self.manager.subscriptions.get(self.websocket, [])),
+      'encoding': self.encoding,
+      'queued': self.queue.qsize(),
+      'sent': self.sent,
+      'frames': self.frames,
+      'batch_ms': self.batch_window * 1000,
+      'dropped': self.dropped,
+      'lag_ms': round(self.lag_ms, 3),
+      'max_lag_ms': round(self.max_lag_ms, 3),
+    }
 
 
 class ConnectionManager:
-  logs_queue = []
-  logs_history = []
   max_history = 10 ** 5
 
   def __init__(self):
     self.active_connections: List[WebSocket] = []
-    self._thread = threading.Thread(target=self._thread_main, daemon=True)
-    self._loop = None
-    self._stop_event = threading.Event()
-    self._thread.start()
-
-  def _thread_main(self):
-    asyncio.set_event_loop(asyncio.new_event_loop())
-    self._loop = asyncio.get_event_loop()
-    self._loop.create_task(self._process_queue())
-    self._loop.run_forever()
-
-  async def _process_queue(self):
-    while not self._stop_event.is_set():
-      while self.logs_queue:
+    self.channels: Dict[WebSocket, ClientChannel] = {}
+    self.subscriptions: Dict[WebSocket, Set[str]] = {}  # Клиент -> темы. Клиент без подписок получает все
+    self.topics: Dict[str, Set[WebSocket]] = {}  # Тема -> подписанные клиенты
+    self.logs_queue = deque()  # (data, permission, queued_at) из любых потоков
+    self.logs_history = LogHistory(self.max_history)
+    self.main_loop: asyncio.AbstractEventLoop = None  # Цикл событий uvicorn, которому принадлежат веб-сокеты
+    self._drain_scheduled = False
+    self.dropped_pending = 0  # События, вытесненные из очереди до запуска цикла событий
+    self.handoff_latency = Histogram()  # От постановки события в очередь до разбора в цикле событий
+    self.send_latency = Histogram()  # От постановки события в очередь до отправки в сокет
+
+  def enqueue(self, data: dict, permission: str = 'all'):
+    """
+    Передача события из любого потока (MQTT, пул узлов, цикл событий) без блокировок:
+    deque.append атомарен, на пачку событий планируется один разбор через call_soon_threadsafe
+    """
+    self.logs_queue.append((data, permission, monotonic()))
+    if self._drain_scheduled:
+      return
+    loop = self.main_loop
+    if loop is None or loop.is_closed():
+      # Цикла событий еще (или уже) нет: события ждут в очереди, разбирает их только цикл событий.
+      # Очередь ограничена ws.pending_size - самые старые события вытесняются
+      while len(self.logs_queue) > (config['ws'] or {}).get('pending_size', 10000):
         try:
-          data, permission = self.logs_queue.pop(0)
-          self.logs_history.append((data, permission))
-          self.logs_history = self.logs_history[-self.max_history:]
-          await self.broadcast(data)
-        except Exception as e:
-          print(f"Error processing item: {e}")
-      await asyncio.sleep(0.1)
+          self.logs_queue.popleft()
+        except IndexError:
+          break
+        self.dropped_pending += 1
+      return
+    self._drain_scheduled = True
+    try:
+      loop.call_soon_threadsafe(self._drain)
+    except RuntimeError:  # Цикл закрыт между проверкой и вызовом
+      self._drain_scheduled = False
+
+  def set_loop(self, loop: asyncio.AbstractEventLoop):
+    """Цикл событий веб-сокетов (при старте приложения). Накопленные до этого события разбираются в нем"""
+    self.main_loop = loop
+    self._drain_scheduled = True
+    loop.call_soon_threadsafe(self._drain)
+
+  def _drain(self):
+    """Разбор очереди событий: история и рассылка. В цикле событий веб-сокетов"""
+    self._drain_scheduled = False
+    while self.logs_queue:
+      try:
+        data, permission, queued_at = self.logs_queue.popleft()
+      except IndexError:  # Очередь разобрана параллельным вызовом
+        break
+      try:
+        self.logs_history.append(data, permission)
+        self.handoff_latency.add((monotonic() - queued_at) * 1000)
+        if self.channels:
+          self.publish(data, permission, queued_at)
+      except Exception as e:
+        print(f"Error processing item: {e}")
 
   async def connect(self, websocket: WebSocket):
     token = websocket.cookies.get("token")
@@ -53,19 +218,133 @@ class ConnectionManager:
 
     await websocket.accept()
     self.active_connections.append(websocket)
+    self.channels[websocket] = ClientChannel(self, websocket)
 
   def disconnect(self, websocket: WebSocket):
     if websocket in self.active_connections:
       self.active_connections.remove(websocket)
+    channel = self.channels.pop(websocket, None)
+    if channel is not None:
+      channel.close()
+    self.unsubscribe(websocket)
 
-  async def broadcast(self, data: dict, permission: str = 'all'):
+  def subscribe(self, websocket: WebSocket, topics: List[str]):
+    subscriptions = self.subscriptions.setdefault(websocket, set())
+    for topic in topics:
+      subscriptions.add(str(topic))
+      self.topics.setdefault(str(topic), set()).add(websocket)
+
+  def unsubscribe(self, websocket: WebSocket, topics: List[str] = None):
+    """Отписка от тем. topics=None - от всех (клиент снова получает все сообщения)"""
+    subscriptions = self.subscriptions.get(websocket, set())
+    for topic in list(subscriptions) if topics is None else [str(topic) for topic in topics]:
+      subscriptions.discard(topic)
+      sockets = self.topics.get(topic)
+      if sockets is not None:
+        sockets.discard(websocket)
+        if not sockets:
+          del self.topics[topic]
+    if not subscriptions:
+      self.subscriptions.pop(websocket, None)
+
+  async def receive(self, websocket: WebSocket, text: str) -> bool:
+    """
+    Команды клиента: {"action": "subscribe" | "unsubscribe", "topics": [...]} - в ответ текущий список подписок;
+    {"action": "batch", "window_ms": 100, "max_events": 200} - пакетная отправка, window_ms=0 - выключить;
+    {"action": "encoding", "format": "json" | "compact" | "msgpack"} - формат кадров, в ответ раскладка compact.
+    False - сообщение не является командой
+    """
+    try:
+      command = json.loads(text)
+    except ValueError:
+      return False
+    if not isinstance(command, dict) or command.get('action') not in ['subscribe', 'unsubscribe', 'batch', 'encoding']:
+      return False
+    channel = self.channels.get(websocket)
+    if command['action'] == 'encoding':
+      if channel is not None:
+        if command.get('format') in encodings():
+          channel.encoding = command['format']
+        channel.put(encode({"type": "ws", "action": "encoding",
+                            "data": {"format": channel.encoding, "encodings": encodings(), **schema()}},
+                           channel.encoding))
+      return True
+    if command['action'] == 'batch':
+      if channel is not None:
+        try:
+          batch = channel.set_batch(command.get('window_ms'), command.get('max_events'))
+        except (TypeError, ValueError):
+          return True
+        channel.put(encode({"type": "ws", "action": "batch", "data": batch}, channel.encoding))
+      return True
+    topics = command.get('topics')
+    if command['action'] == 'subscribe':
+      self.subscribe(websocket, topics or [])
+    else:
+      self.unsubscribe(websocket, topics)
+    if channel is not None:
+      channel.put(encode({"type": "ws", "action": "subscriptions",
+                          "data": {"topics": sorted(self.subscriptions.get(websocket, []))}}, channel.encoding))
+    return True
+
+  def recipients(self, data: dict) -> List[WebSocket]:
+    """Клиенты без подписок и клиенты, подписанные на одну из тем сообщения"""
+    if not self.topics:
+      return list(self.active_connections)
+    sockets = set()
+    for topic in message_topics(data):
+      sockets.update(self.topics.get(topic, ()))
+    return [connection for connection in self.active_connections
+            if connection in sockets or connection not in self.subscriptions]
+
+  def publish(self, data: dict, permission: str = 'all', queued_at: float = None):
+    """
+    Кладет сообщение в очереди получателей, не дожидаясь отправки. Только в цикле событий веб-сокетов.
+    Сообщение кодируется один раз для каждого формата получателей
+    """
     # todo send data to all clients by permission
-    for connection in self.active_connections:
-      try:
-        await asyncio.create_task(connection.send_text(json.dumps(data, default=serialize_datetime)))
-      except WebSocketDisconnect:
-        log_print("Disconnecting", connection.client.host)
-        self.disconnect(connection)
+    recipients = self.recipients(data)
+    if not recipients:
+      return
+    payloads = {}
+    for connection in recipients:
+      channel = self.channels.get(connection)
+      if channel is None:
+        continue
+      payload = payloads.get(channel.encoding)
+      if payload is None:
+        payload = payloads[channel.encoding] = encode(data, channel.encoding)
+      channel.put(payload, queued_at)
+
+  async def broadcast(self, data: dict, permission: str = 'all'):
+    try:
+      loop = asyncio.get_running_loop()
+    except RuntimeError:
+      loop = None
+    if loop is self.main_loop:
+      self.publish(data, permission)
+    else:
+      self.broadcast_threadsafe(data, permission)
+
+  def broadcast_threadsafe(self, data: dict, permission: str = 'all'):
+    """Отправка из любого потока без ожидания: publish планируется в цикле событий веб-сокетов"""
+    loop = self.main_loop
+    if loop is None or loop.is_closed() or not self.active_connections:
+      return
+    loop.call_soon_threadsafe(self.publish, data, permission, monotonic())
+
+  def stats(self) -> dict:
+    return {
+      'clients': [channel.stats() for channel in list(self.channels.values())],
+      'topics': {topic: len(sockets) for topic, sockets in self.topics.items()},
+      'logs_queue': len(self.logs_queue),
+      'dropped_pending': self.dropped_pending,
+      'logs_history': len(self.logs_history),
+      'handoff_latency_ms': self.handoff_latency.get_json(with_buckets=False),
+      'send_latency_ms': self.send_latency.get_json(with_buckets=False),
+      'queue_size': config['ws']['queue_size'],
+      'overflow': config['ws']['overflow'],
+    }
 
   def broadcast_log(self,
                     text: str = None,
@@ -94,6 +373,7 @@ class ConnectionManager:
     if isinstance(value, dict) and 'new_value' in value and len(value['new_value']) == 2:
       value = value['new_value'][0]
     class_name = class_name or (dag and dag.__class__.__name__)
+    page = getattr(dag, 'page', None)
     data = {
       "type": _type,
       "level": level,
@@ -110,11 +390,31 @@ class ConnectionManager:
       "value": value,
       "value_raw": value_raw,
       "action": action,
+      "tpl_id": page[1:] if isinstance(page, str) and page.startswith('vtpl:') else None,
       "ts": datetime.now().timestamp()
     }
     data = {k: v for k, v in data.items() if v is not None}
-    log_print({k: v for k, v in data.items() if v not in ['permission', 'level', 'ts', 'type']})
-    self.logs_queue.append((data, permission))
+    # Несколько событий на каждое сообщение устройства - в лог только на уровне debug
+    if log_enabled('debug'):
+      log_print({k: v for k, v in data.items() if k not in ['permission', 'level', 'ts', 'type']}, level='debug')
+    self.enqueue(data, permission)
 
 
 connection_manager = ConnectionManager()
+
+
+def add_route(app):
+  from fastapi import Depends
+  from utils.auth import RoleChecker
+
+  @app.on_event("startup")
+  async def capture_ws_loop():
+    connection_manager.set_loop(asyncio.get_running_loop())
+
+  @app.get("/api/live/ws",
+           tags=["live/devices"],
+           response_model=dict,
+           dependencies=[Depends(RoleChecker('admin'))])
+  def get_ws_stats():
+    """Клиенты веб-сокетов: подписки, глубина очереди отправки, отброшенные сообщения и задержка"""
+    return connection_manager.stats()
@@ -0,0 +1,215 @@
+from collections import deque
+from time import time, monotonic
+import os
+import sqlite3
+import threading
+
+from utils.configs import config
+from utils.logs import log_print
+
+RESOLUTIONS = {'1m': 60, '1h': 3600}
+
+
+class TimeSeriesStore:
+  """
+  Хранилище истории значений портов в отдельном SQLite (store/timeseries.db).
+  add() только кладет значение в очередь и не блокирует поток MQTT, запись идет в фоновом потоке
+  пакетами в одной транзакции. Сырые значения хранятся raw_days дней,
+  агрегаты по минутам и часам (count/sum/min/max) - minute_days и hour_days.
+  Выключено по умолчанию: включается timeseries.enabled в config.yaml.
+  """
+
+  def __init__(self):
+    self._queue = deque()
+    self._wake = threading.Event()
+    self._write_lock = threading.Lock()
+    self._thread: threading.Thread = None
+    self._db: sqlite3.Connection = None
+    self._last_cleanup = 0
+    self.written = 0
+    self.dropped = 0
+    self.flushes = 0
+    self.last_flush_ms = 0.0
+
+  @property
+  def settings(self) -> dict:
+    return config['timeseries']
+
+  @property
+  def path(self) -> str:
+    return os.path.abspath(self.settings['path'])
+
+  def add(self, port_id: int, ts: float, value):
+    """Добавляет значение в очередь записи. Нечисловые значения пропускаются"""
+    if not self.settings['enabled'] or value is None:
+      return
+    try:
+      value = float(value)
+    except (TypeError, ValueError):
+      return
+    if len(self._queue) >= self.settings['max_queue']:
+      self.dropped += 1
+      return
+    self._queue.append((port_id, ts, value))
+    if self._thread is None:
+      self._start()
+    elif len(self._queue) >= self.settings['batch_size']:
+      self._wake.set()
+
+  def _start(self):
+    with self._write_lock:
+      if self._thread is None:
+        self._thread = threading.Thread(target=self._run, name='timeseries', daemon=True)
+        self._thread.start()
+
+  def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+    db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+    if not read_only:
+      db.execute('PRAGMA journal_mode=WAL')
+      db.execute('PRAGMA synchronous=NORMAL')
+      db.execute('CREATE TABLE IF NOT EXISTS raw (port_id INTEGER NOT NULL, ts REAL NOT NULL, value REAL NOT NULL, '
+                 'PRIMARY KEY (port_id, ts)) WITHOUT ROWID')
+      for name in RESOLUTIONS:
+        db.execute(f'CREATE TABLE IF NOT EXISTS rollup_{name} (port_id INTEGER NOT NULL, bucket INTEGER NOT NULL, '
+                   f'count INTEGER NOT NULL, sum REAL NOT NULL, min REAL NOT NULL, max REAL NOT NULL, '
+                   f'PRIMARY KEY (port_id, bucket)) WITHOUT ROWID')
+      db.commit()
+    return db
+
+  def _run(self):
+    while True:
+      self._wake.wait(self.settings['flush_interval'])
+      self._wake.clear()
+      try:
+        self.flush()
+        if time() - self._last_cleanup > 3600:
+          self.cleanup()
+      except Exception as e:
+        log_print(f"💥 timeseries write error: {e}")
+
+  def flush(self):
+    """Записывает все накопленные значения. Можно вызывать из любого потока"""
+    with self._write_lock:
+      if self._db is None:
+        self._db = self._connect()
+      while self._queue:
+        batch = []
+        for _ in range(min(len(self._queue), self.settings['batch_size'])):
+          batch.append(self._queue.popleft())
+        self._write(batch)
+
+  def _write(self, batch: list):
+    """
+    Сырые значения пишутся с заменой по (port_id, ts). Агрегаты пересчитываются из хранимых строк
+    для затронутых интервалов: минуты из raw, часы из rollup_1m - повторная метка времени не считается дважды
+    """
+    start = monotonic()
+    minutes = {(port_id, int(ts // 60 * 60)) for port_id, ts, _ in batch}
+    hours = {(port_id, bucket // 3600 * 3600) for port_id, bucket in minutes}
+
+    with self._db:
+      self._db.executemany('INSERT OR REPLACE INTO raw (port_id, ts, value) VALUES (?, ?, ?)', batch)
+      self._db.executemany(
+        'INSERT OR REPLACE INTO rollup_1m (port_id, bucket, count, sum, min, max) '
+        'SELECT port_id, ?, COUNT(*), SUM(value), MIN(value), MAX(value) FROM raw '
+        'WHERE port_id = ? AND ts >= ? AND ts < ? GROUP BY port_id',
+        [(bucket, port_id, bucket, bucket + 60) for port_id, bucket in minutes])
+      self._db.executemany(
+        'INSERT OR REPLACE INTO rollup_1h (port_id, bucket, count, sum, min, max) '
+        'SELECT port_id, ?, SUM(count), SUM(sum), MIN(min), MAX(max) FROM rollup_1m '
+        'WHERE port_id = ? AND bucket >= ? AND bucket < ? GROUP BY port_id',
+        [(bucket, port_id, bucket, bucket + 3600) for port_id, bucket in hours])
+    self.written += len(batch)
+    self.flushes += 1
+    self.last_flush_ms = round((monotonic() - start) * 1000, 3)
+
+  def cleanup(self):
+    """Удаляет данные старше сроков хранения"""
+    with self._write_lock:
+      if self._db is None:
+        self._db = self._connect()
+      self._last_cleanup = time()
+      now = time()
+      port_ids = [row[0] for row in self._db.execute('SELECT DISTINCT port_id FROM rollup_1h')]
+      with self._db:
+        # Удаление по каждому порту использует первичный ключ (port_id, ts)
+        for port_id in port_ids:
+          self._db.execute('DELETE FROM raw WHERE port_id = ? AND ts < ?',
+                           (port_id, now - self.settings['raw_days'] * 86400))
+          self._db.execute('DELETE FROM rollup_1m WHERE port_id = ? AND bucket < ?',
+                           (port_id, now - self.settings['minute_days'] * 86400))
+          self._db.execute('DELETE FROM rollup_1h WHERE port_id = ? AND bucket < ?',
+                           (port_id, now - self.settings['hour_days'] * 86400))
+
+  def resolution_for(self, since: float, until: float) -> str:
+    """Разрешение по длине периода и срокам хранения"""
+    now = time()
+    span = until - since
+    if span <= 86400 and since >= now - self.settings['raw_days'] * 86400:
+      return 'raw'
+    if span <= 31 * 86400 and since >= now - self.settings['minute_days'] * 86400:
+      return '1m'
+    return '1h'
+
+  def query(self, port_id: int, since: float = None, until: float = None, resolution: str = 'auto') -> dict:
+    """Значения порта за период по колонкам. resolution: raw | 1m | 1h | auto"""
+    until = until if until is not None else time()
+    since = since if since is not None else until - 3600
+    if resolution not in ['raw', *RESOLUTIONS]:
+      resolution = self.resolution_for(since, until)
+    if not os.path.exists(self.path):
+      return {'resolution': resolution, 'ts': [], 'min': [], 'max': [], 'avg': [], 'count': []}
+
+    db = self._connect(read_only=True)
+    try:
+      if resolution == 'raw':
+        rows = db.execute('SELECT ts, value, value, value, 1 FROM raw WHERE port_id = ? AND ts BETWEEN ? AND ? '
+                          'ORDER BY ts', (port_id, since, until)).fetchall()
+      else:
+        period = RESOLUTIONS[resolution]
+        rows = db.execute(f'SELECT bucket, min, max, sum / count, count FROM rollup_{resolution} '
+                          f'WHERE port_id = ? AND bucket BETWEEN ? AND ? ORDER BY bucket',
+                          (port_id, since // period * period, until)).fetchall()
+    finally:
+      db.close()
+    columns = list(zip(*rows)) or [()] * 5
+    return {'resolution': resolution, **{name: list(column) for name, column in
+                                         zip(['ts', 'min', 'max', 'avg', 'count'], columns)}}
+
+  def stats(self) -> dict:
+    return {
+      'enabled': self.settings['enabled'],
+      'path': self.path,
+      'queued': len(self._queue),
+      'written': self.written,
+      'dropped': self.dropped,
+      'flushes': self.flushes,
+      'last_flush_ms': self.last_flush_ms,
+    }
+
+
+timeseries_store = TimeSeriesStore()
+
+
+def add_route(app):
+  from fastapi import Depends
+  from utils.auth import RoleChecker
+
+  @app.on_event("shutdown")
+  def flush_timeseries():
+    if timeseries_store._thread is not None:
+      timeseries_store.flush()
+
+  @app.get("/api/live/ports/{port_id}/series",
+           tags=["live/devices"],
+           response_model=dict)
+  def get_port_series(port_id: int, since: float = None, until: float = None, resolution: str = 'auto'):
+    return {'id': port_id, **timeseries_store.query(port_id, since, until, resolution)}
+
+  @app.get("/api/live/timeseries",
+           tags=["live/devices"],
+           response_model=dict,
+           dependencies=[Depends(RoleChecker('admin'))])
+  def get_timeseries_stats():
+    return timeseries_store.stats()
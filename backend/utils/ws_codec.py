@@ -0,0 +1,68 @@
+"""
+Кодирование сообщений веб-сокета. Формат выбирает клиент командой encoding:
+  json     - JSON-объекты (по умолчанию)
+  compact  - JSON, сообщения log/port - массивы [type, значения по LOG_KEYS], без повторения ключей
+  msgpack  - MessagePack (бинарные кадры) с той же компактной раскладкой. Нужен пакет msgpack
+"""
+from datetime import datetime
+import json
+
+try:
+  import msgpack
+except ImportError:  # msgpack не установлен - доступны только JSON-форматы
+  msgpack = None
+
+# Порядок полей сообщений broadcast_log в компактной раскладке. Добавлять только в конец
+LOG_KEYS = ('level', 'permission', 'message', 'device_id', 'dag_id', 'dag_port_id', 'pin_id', 'pin_name',
+            'port_id', 'direction', 'class_name', 'value', 'value_raw', 'action', 'tpl_id', 'ts')
+COMPACT_TYPES = ('log', 'port')
+
+
+# Define a custom function to serialize datetime objects
+def serialize_datetime(obj):
+  if isinstance(obj, datetime):
+    return obj.isoformat()
+  print("Type not serializable", obj)
+  raise TypeError("Type not serializable")
+
+
+def compact(data):
+  """Сообщение log/port -> [type, значения по LOG_KEYS], хвостовые None отбрасываются"""
+  if not isinstance(data, dict) or data.get('type') not in COMPACT_TYPES:
+    return data
+  values = [data['type'], *map(data.get, LOG_KEYS)]
+  while values[-1] is None:
+    values.pop()
+  return values
+
+
+def encodings() -> list:
+  return ['json', 'compact'] + (['msgpack'] if msgpack is not None else [])
+
+
+def encode(data, encoding: str = 'json'):
+  """str для текстовых кадров, bytes для бинарных"""
+  if encoding == 'compact':
+    return json.dumps(compact(data), default=serialize_datetime)
+  if encoding == 'msgpack':
+    return msgpack.packb(compact(data), default=serialize_datetime)
+  return json.dumps(data, default=serialize_datetime)
+
+
+def join_batch(items: list):
+  """Склейка уже закодированных сообщений в один массив без повторного кодирования"""
+  if isinstance(items[0], bytes):
+    count = len(items)
+    if count < 16:
+      header = bytes([0x90 | count])  # fixarray
+    elif count < 0x10000:
+      header = b'\xdc' + count.to_bytes(2, 'big')  # array 16
+    else:
+      header = b'\xdd' + count.to_bytes(4, 'big')  # array 32
+    return header + b''.join(items)
+  return f'[{",".join(items)}]'
+
+
+def schema() -> dict:
+  """Описание компактной раскладки для клиента"""
+  return {'types': list(COMPACT_TYPES), 'keys': list(LOG_KEYS)}
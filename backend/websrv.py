@@ -6,7 +6,7 @@ from fastapi.responses import FileResponse
 from orchestrator.dag_manager import router as dag_router, DAGManager
 from orchestrator.orchestrator import router as orchestrator_router, Orchestrator
 from orchestrator.template_manager import router as template_router, TemplateManager
-from utils.socket_utils import connection_manager
+from utils.socket_utils import connection_manager, add_route as socket_route
 from pathlib import Path
 from os import path
 from utils.db_utils import init_db
@@ -18,6 +18,7 @@ from utils.system import add_route as system_route
 from models.connections import init_connectors
 from models.devices import devices_init
 from utils.icon_config import add_route as icon_config_route
+from utils.timeseries import add_route as timeseries_route
 
 from utils.google_connector import GoogleConnector
 # from init import init
@@ -59,6 +60,8 @@ error_logger_route(app)
 init_error_handling()
 system_route(app)
 icon_config_route(app)
+timeseries_route(app)
+socket_route(app)
 
 
 # nest_asyncio.apply()
@@ -79,6 +82,10 @@ async def restart():
   """
   print('start restart')
   from models.singelton import SingletonClass
+  from models.devices import Devices
+  from orchestrator.checkpoint import dag_checkpointer
+  Devices().save_snapshot(force=True)  # Значения портов восстановятся после перезапуска
+  dag_checkpointer.checkpoint()
   SingletonClass.restart_all()
   init_dags(False)
   return {"status": "restarting", "message": "Server will restart"}
@@ -93,6 +100,8 @@ async def websocket_endpoint(websocket: WebSocket, access_token=Cookie(None)):
   try:
     while True:
       data = await websocket.receive_text()
+      if await connection_manager.receive(websocket, data):
+        continue
       await connection_manager.broadcast(f"Message text was: {data}")
   except WebSocketDisconnect:
     connection_manager.disconnect(websocket)
@@ -7,6 +7,10 @@ export class WebSocketService {
     this.url = url;
     this.socket = null;
     this.listeners = new Map();
+    this.topics = new Set(); // Темы подписки; без подписок сервер отправляет все сообщения
+    this.batch = {window_ms: 100, max_events: 200}; // Пакетная отправка: события за окно приходят одним массивом
+    this.encoding = 'compact'; // compact - сообщения log/port приходят массивами значений без ключей
+    this.compactKeys = [];
     this.retryCount = 0;
     this.MAX_RETRIES = 5;
     this.connect();
@@ -23,15 +27,24 @@ export class WebSocketService {
         this.state = 'connected';
         console.info("ws: connected");
         this.retryCount = 0; // Сбросить счётчик при успешном подключении
+        this.send({action: 'encoding', format: this.encoding});
+        if (this.batch.window_ms) {
+          this.send({action: 'batch', ...this.batch});
+        }
+        if (this.topics.size) {
+          this.send({action: 'subscribe', topics: [...this.topics]});
+        }
+        (this.listeners.get('ws:open') || []).forEach((callback) => callback());
       };
 
       this.socket.onmessage = (event) => {
         // console.log("ws: message:", event.data);
         const data = JSON.parse(event.data);
-        const eventKey = `${data.type}:${data.action || ''}`;
-        const payload = data.data || data;
-        if (this.listeners.has(eventKey)) {
-          this.listeners.get(eventKey).forEach((callback) => callback(payload));
+        // Пакет - массив сообщений; сообщение в компактной раскладке - массив, начинающийся с типа
+        if (Array.isArray(data) && typeof data[0] !== 'string') {
+          data.forEach((item) => this.dispatch(item));
+        } else {
+          this.dispatch(data);
         }
       };
 
@@ -55,6 +68,58 @@ export class WebSocketService {
     }
   }
 
+  expand(values) {
+    const data = {type: values[0]};
+    this.compactKeys.forEach((key, index) => {
+      const value = values[index + 1];
+      if (value !== undefined && value !== null) {
+        data[key] = value;
+      }
+    });
+    return data;
+  }
+
+  dispatch(data) {
+    if (Array.isArray(data)) {
+      data = this.expand(data);
+    }
+    if (data.type === 'ws' && data.action === 'encoding') {
+      this.compactKeys = data.data.keys;
+    }
+    const eventKey = `${data.type}:${data.action || ''}`;
+    const payload = data.data || data;
+    if (this.listeners.has(eventKey)) {
+      this.listeners.get(eventKey).forEach((callback) => callback(payload));
+    }
+  }
+
+  // windowMs = 0 - каждое событие отдельным кадром
+  setBatching(windowMs, maxEvents = 200) {
+    this.batch = {window_ms: windowMs, max_events: maxEvents};
+    this.send({action: 'batch', ...this.batch});
+  }
+
+  send(data) {
+    if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+      this.socket.send(JSON.stringify(data));
+    }
+  }
+
+  // topics: 'type:log', 'level:error', 'dag:<id>', 'template:<tpl_id>', 'device:<id>', 'port:<id>'
+  subscribe(topics) {
+    topics.forEach((topic) => this.topics.add(topic));
+    this.send({action: 'subscribe', topics});
+  }
+
+  unsubscribe(topics = null) {
+    if (topics === null) {
+      this.topics.clear();
+    } else {
+      topics.forEach((topic) => this.topics.delete(topic));
+    }
+    this.send({action: 'unsubscribe', topics});
+  }
+
   onMessage(group, type, callback) {
     const eventKey = `${group}:${type}`;
     if (!this.listeners.has(eventKey)) {
@@ -7,6 +7,8 @@ export const usePortsStore = defineStore('ports', {
   state: () => ({
     ports: reactive({}),   // Реактивные данные портов
     ts_delta: 0,           // Коррекция времени
+    seq: null,             // Номер последнего полученного изменения портов
+    epoch: null,           // Эпоха сервера, к которой относится seq
     now: ref(Date.now() / 1000), // Реактивное текущее время
     timer: null,           // Обновляющийся таймер
     isLoaded: false,       // Уже загружали данные?
@@ -19,18 +21,29 @@ export const usePortsStore = defineStore('ports', {
       this.startTimer()
       this.subscribePorts()
       try {
-        const response = await secureFetch('/api/live/ports');
+        // После первой загрузки запрашиваем только изменившиеся порты
+        const url = this.isLoaded && this.seq !== null && this.epoch
+          ? `/api/live/ports?since=${this.seq}&epoch=${this.epoch}`
+          : '/api/live/ports';
+        const response = await secureFetch(url);
         const data = await response.json();
 
         if (data['0'] && data['0'].ts) {
           const server_ts = data['0'].ts;
           const local_ts = Date.now() / 1000;
           this.ts_delta = local_ts - server_ts;
+          this.seq = data['0'].seq ?? null;
+          this.epoch = data['0'].epoch ?? null;
         }
 
         const new_ports = {...data};
         delete new_ports['0'];
 
+        if (data['0'] && data['0'].full) {
+          // Полный снимок (первая загрузка или перезапуск сервера) заменяет прежнее состояние
+          Object.keys(this.ports).filter((id) => !(id in new_ports)).forEach((id) => delete this.ports[id]);
+        }
+
         for (const id in new_ports) {
           this.ports[id] = new_ports[id];
         }
@@ -44,6 +57,11 @@ export const usePortsStore = defineStore('ports', {
     subscribePorts(force = false) {
       if (this.isSubscribed && !force) return;
 
+      // После переподключения сокета догружаем изменения, пропущенные за время разрыва
+      webSocketService.onMessage('ws', 'open', () => {
+        if (this.isLoaded) this.loadPorts(true);
+      });
+
       webSocketService.onMessage('port', 'in', (data) => {
         if (!data || typeof data !== 'object' || data.pin_id === undefined) {
           return;